@@ -0,0 +1,165 @@
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+import hashlib
+import io
+import tarfile
+import zipfile
+import zlib
+from merge import normalise_path
+
+ARCHIVE_MEDIA_TYPES = {
+    "zip": "application/zip",
+    "tar.gz": "application/gzip"
+}
+
+# Fixed timestamps keep archives byte-identical, so ranges stay valid across requests
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+TAR_MTIME = 315532800
+
+CHUNK_SIZE = 64 * 1024
+
+EXECUTABLE_SUFFIXES = (".sh", ".bash", ".zsh", ".command")
+EXECUTABLE_NAMES = frozenset({"gradlew", "mvnw", "manage.py"})
+
+
+def file_mode(filename: str, content: str) -> int:
+    """Unix permissions for an archived file.
+
+    Scripts (by shebang, extension or well-known wrapper name) are
+    executable; everything else, Dockerfiles included, is 0644.
+    """
+    basename = filename.rsplit("/", 1)[-1].lower()
+    if content.startswith("#!") or basename.endswith(EXECUTABLE_SUFFIXES) or basename in EXECUTABLE_NAMES:
+        return 0o755
+    return 0o644
+
+
+def archive_entries(files: Iterable[Dict], root: str) -> Iterator[Tuple[str, str, int]]:
+    """(path, content, mode) entries under ``root`` in path order, skipping paths that escape it.
+
+    Bodies stay as the caller's strings; they are encoded one at a time
+    as each entry is written.
+    """
+    entries = {}
+    for file in files:
+        path = normalise_path(file.get("filename") or "")
+        if not path or path == ".." or path.startswith("../"):
+            continue
+        entries[f"{root}/{path}"] = file.get("content") or ""
+    for path in sorted(entries):
+        content = entries[path]
+        yield path, content, file_mode(path, content)
+
+
+def archive_etag(files: Iterable[Dict], archive_format: str, root: str) -> str:
+    digest = hashlib.sha256(f"{archive_format}\0{root}\0".encode())
+    for path, content, mode in archive_entries(files, root):
+        body = content.encode("utf-8")
+        digest.update(f"{path}\0{mode}\0{len(body)}\0".encode())
+        digest.update(body)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+class _Sink(io.RawIOBase):
+    """Unseekable write target whose buffered bytes are drained by the generator"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _iter_zip(entries: Iterable[Tuple[str, str, int]]) -> Iterator[bytes]:
+    sink = _Sink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for path, content, mode in entries:
+            body = content.encode("utf-8")
+            info = zipfile.ZipInfo(path, date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.create_system = 3
+            info.external_attr = (0o100000 | mode) << 16
+            with archive.open(info, mode="w") as entry:
+                for start in range(0, len(body), CHUNK_SIZE):
+                    entry.write(body[start:start + CHUNK_SIZE])
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _iter_tar_gz(entries: Iterable[Tuple[str, str, int]]) -> Iterator[bytes]:
+    # zlib writes a gzip header without a timestamp, unlike tarfile's "w|gz"
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    sink = _Sink()
+    with tarfile.open(fileobj=sink, mode="w|", format=tarfile.PAX_FORMAT) as archive:
+        for path, content, mode in entries:
+            body = content.encode("utf-8")
+            info = tarfile.TarInfo(path)
+            info.size = len(body)
+            info.mode = mode
+            info.mtime = TAR_MTIME
+            info.uname = info.gname = ""
+            archive.addfile(info, io.BytesIO(body))
+            yield compressor.compress(sink.drain())
+    yield compressor.compress(sink.drain()) + compressor.flush()
+
+
+def iter_archive(files: Iterable[Dict], archive_format: str, root: str) -> Iterator[bytes]:
+    """Build the archive incrementally, yielding bytes as each file is written.
+
+    Only the file being written is encoded and buffered, so memory stays
+    flat however large the project is, and the output is deterministic for
+    a given set of files.
+    """
+    entries = archive_entries(files, root)
+    chunks = _iter_zip(entries) if archive_format == "zip" else _iter_tar_gz(entries)
+    return (chunk for chunk in chunks if chunk)
+
+
+def archive_size(files: Iterable[Dict], archive_format: str, root: str) -> int:
+    return sum(len(chunk) for chunk in iter_archive(files, archive_format, root))
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive offsets.
+
+    Returns None for headers that should be ignored (malformed, other
+    units or several ranges) and raises ValueError when the range is
+    unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    first, _, last = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or "," in spec or not (first or last):
+        return None
+    if not (first or "0").isdigit() or not (last or "0").isdigit():
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+        if not int(last):
+            raise ValueError(f"Unsatisfiable range: {header}")
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return start, end
+
+
+def iter_range(chunks: Iterable[bytes], start: int, end: int) -> Iterator[bytes]:
+    """Yield the inclusive byte range ``start``-``end`` of a chunk stream"""
+    offset = 0
+    for chunk in chunks:
+        chunk_end = offset + len(chunk)
+        if chunk_end > start:
+            yield chunk[max(start - offset, 0):end + 1 - offset]
+        if chunk_end > end:
+            return
+        offset = chunk_end
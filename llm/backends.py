@@ -0,0 +1,274 @@
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import aiohttp
+import numpy as np
+from huggingface_hub import AsyncInferenceClient
+
+
+def to_namespace(data: Any) -> Any:
+    """Give decoded JSON the attribute access of the HF response dataclasses"""
+    if isinstance(data, dict):
+        return SimpleNamespace(**{key: to_namespace(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return [to_namespace(item) for item in data]
+    return data
+
+
+class InferenceBackend(ABC):
+    """A chat and embedding model behind some transport.
+
+    Responses mirror the OpenAI chat completion shape (``choices[0].message``,
+    ``finish_reason`` and ``usage``); streams yield chunks with
+    ``choices[0].delta``. Each backend carries its own concurrency limit.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str, embedding_model: str, max_concurrency: int):
+        self.model = model
+        self.embedding_model = embedding_model
+        self.max_concurrency = max_concurrency
+
+    @abstractmethod
+    async def chat_completion(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int):
+        ...
+
+    @abstractmethod
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> AsyncIterator[Any]:
+        ...
+
+    @abstractmethod
+    async def feature_extraction(self, text: str) -> Any:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class HuggingFaceBackend(InferenceBackend):
+    """Hugging Face Inference API (or a TGI endpoint via ``base_url``)"""
+
+    name = "hf"
+
+    def __init__(
+        self,
+        model: str,
+        embedding_model: str,
+        max_concurrency: int,
+        api_key: Optional[str],
+        timeout: float,
+        base_url: Optional[str] = None
+    ):
+        super().__init__(model, embedding_model, max_concurrency)
+        if base_url:
+            self.client = AsyncInferenceClient(base_url=base_url, api_key=api_key, timeout=timeout)
+        else:
+            self.client = AsyncInferenceClient(api_key=api_key, model=model, timeout=timeout)
+
+    async def chat_completion(self, messages, temperature, max_tokens):
+        return await self.client.chat_completion(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+
+    async def stream_chat_completion(self, messages, temperature, max_tokens):
+        return await self.client.chat_completion(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+
+    async def feature_extraction(self, text):
+        return await self.client.feature_extraction(text, model=self.embedding_model)
+
+    async def close(self):
+        close = getattr(self.client, "close", None)
+        if close:
+            await close()
+
+
+class OpenAICompatibleBackend(InferenceBackend):
+    """Any server implementing ``/v1/chat/completions`` (vLLM, llama.cpp, TGI, ...).
+
+    All requests share one keep-alive ``aiohttp`` session whose connection
+    pool is sized to the backend's concurrency limit.
+    """
+
+    name = "openai"
+
+    def __init__(
+        self,
+        model: str,
+        embedding_model: str,
+        max_concurrency: int,
+        base_url: str,
+        api_key: Optional[str],
+        timeout: float
+    ):
+        super().__init__(model, embedding_model, max_concurrency)
+        self.base_url = base_url.rstrip("/")
+        if not self.base_url.endswith("/v1"):
+            self.base_url += "/v1"
+        self.api_key = api_key
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session binds to the running event loop
+        if self._session is None or self._session.closed:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers=headers
+            )
+        return self._session
+
+    def _payload(self, messages, temperature, max_tokens, **extra) -> Dict:
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            **extra
+        }
+
+    async def chat_completion(self, messages, temperature, max_tokens):
+        async with self.session.post(
+            f"{self.base_url}/chat/completions",
+            json=self._payload(messages, temperature, max_tokens)
+        ) as response:
+            response.raise_for_status()
+            return to_namespace(await response.json())
+
+    async def stream_chat_completion(self, messages, temperature, max_tokens):
+        response = await self.session.post(
+            f"{self.base_url}/chat/completions",
+            json=self._payload(messages, temperature, max_tokens, stream=True)
+        )
+        try:
+            response.raise_for_status()
+        except aiohttp.ClientResponseError:
+            response.release()
+            raise
+        return self._read_events(response)
+
+    async def _read_events(self, response: aiohttp.ClientResponse) -> AsyncIterator[Any]:
+        """Decode a server-sent event stream of completion chunks"""
+        try:
+            async for line in response.content:
+                line = line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                yield to_namespace(json.loads(data))
+        finally:
+            response.release()
+
+    async def feature_extraction(self, text):
+        async with self.session.post(
+            f"{self.base_url}/embeddings",
+            json={"model": self.embedding_model, "input": text}
+        ) as response:
+            response.raise_for_status()
+            payload = await response.json()
+        return payload["data"][0]["embedding"]
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class FakeBackend(InferenceBackend):
+    """Deterministic in-process backend for tests and local development.
+
+    Completions are a small valid generation derived from a hash of the
+    messages, so identical requests always produce identical output.
+    """
+
+    name = "fake"
+
+    def __init__(self, model: str, embedding_model: str, max_concurrency: int, latency: float = 0.0, dimensions: int = 384):
+        super().__init__(model, embedding_model, max_concurrency)
+        self.latency = latency
+        self.dimensions = dimensions
+
+    def _content(self, messages: List[Dict[str, str]]) -> str:
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()[:12]
+        return json.dumps({
+            "files": [{
+                "filename": f"src/generated_{digest}.ts",
+                "content": f"// Generated by the fake backend ({digest})\nexport {{}};\n",
+                "language": "typescript"
+            }],
+            "setup_instructions": "Generated by the fake backend",
+            "dependencies": {}
+        })
+
+    async def chat_completion(self, messages, temperature, max_tokens):
+        await asyncio.sleep(self.latency)
+        content = self._content(messages)
+        return to_namespace({
+            "model": self.model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": (len(content) + 3) // 4}
+        })
+
+    async def stream_chat_completion(self, messages, temperature, max_tokens):
+        await asyncio.sleep(self.latency)
+        content = self._content(messages)
+
+        async def chunks():
+            for start in range(0, len(content), 16):
+                yield to_namespace({"choices": [{"index": 0, "delta": {"content": content[start:start + 16]}}]})
+
+        return chunks()
+
+    async def feature_extraction(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+        return np.random.default_rng(seed).standard_normal(self.dimensions).tolist()
+
+
+BACKEND_NAMES = (HuggingFaceBackend.name, OpenAICompatibleBackend.name, FakeBackend.name)
+
+
+def create_backend(
+    kind: str,
+    model: str,
+    embedding_model: str,
+    max_concurrency: int,
+    timeout: float,
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None
+) -> InferenceBackend:
+    """Build the backend named by ``kind`` (``hf``, ``openai`` or ``fake``)"""
+    kind = (kind or HuggingFaceBackend.name).lower()
+    if kind == HuggingFaceBackend.name:
+        return HuggingFaceBackend(model, embedding_model, max_concurrency, api_key, timeout, base_url)
+    if kind == OpenAICompatibleBackend.name:
+        if not base_url:
+            raise ValueError("The openai inference backend requires a base URL")
+        return OpenAICompatibleBackend(model, embedding_model, max_concurrency, base_url, api_key, timeout)
+    if kind == FakeBackend.name:
+        return FakeBackend(model, embedding_model, max_concurrency)
+    raise ValueError(f"Unknown inference backend '{kind}', expected one of {', '.join(BACKEND_NAMES)}")
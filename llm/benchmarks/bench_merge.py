@@ -0,0 +1,53 @@
+"""Benchmark merging AI output into the base structure.
+
+Run from the ``llm`` directory::
+
+    python -m benchmarks.bench_merge
+"""
+import time
+from merge import merge_artifacts
+
+
+def make_files(count: int, prefix: str, offset: int = 0):
+    return [
+        {"filename": f"{prefix}/file_{i:05d}.ts", "content": f"// {prefix} {i}", "language": "typescript"}
+        for i in range(offset, offset + count)
+    ]
+
+
+def legacy_merge(base_structure, generated_files):
+    """The previous merge loop from generate_project, kept for comparison"""
+    final_structure = []
+    base_files = {f["filename"]: f for f in base_structure}
+    for file in generated_files:
+        if file["filename"] in base_files:
+            base_files[file["filename"]].update(file)
+            final_structure.append(base_files[file["filename"]])
+        else:
+            final_structure.append(file)
+    for base_file in base_structure:
+        if base_file["filename"] not in {f["filename"] for f in final_structure}:
+            final_structure.append(base_file)
+    final_structure.sort(key=lambda x: x["filename"])
+    return final_structure
+
+
+def measure(func, count: int) -> float:
+    # Half of the AI files overwrite base files, half are new
+    base = make_files(count, "src")
+    generated = make_files(count // 2, "src", count // 2) + make_files(count // 2, "lib")
+    start = time.perf_counter()
+    func(base, generated)
+    return time.perf_counter() - start
+
+
+def main():
+    for count in (1000, 2000, 10000):
+        line = f"{count:>6} files  merge_artifacts {measure(merge_artifacts, count) * 1e3:9.2f} ms"
+        if count <= 2000:
+            line += f"  legacy {measure(legacy_merge, count) * 1e3:9.2f} ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
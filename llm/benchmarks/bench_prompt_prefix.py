@@ -0,0 +1,100 @@
+"""Benchmark time-to-first-token for the prefix-cache-friendly prompt layout.
+
+Needs an OpenAI-compatible server with prefix caching, e.g. vLLM started
+with ``--enable-prefix-caching`` or a llama.cpp server. Run from the ``llm``
+directory::
+
+    BENCH_BASE_URL=http://localhost:8080 BENCH_MODEL=Qwen/Qwen2.5-Coder-7B-Instruct \\
+        python -m benchmarks.bench_prompt_prefix
+
+Every request is sent twice, once with the stable layout built by
+``PromptBuilder`` and once with the same sections in the previous
+variable-first order (request and files first, instructions last). The
+variable-first pass runs first so it cannot benefit from prefixes cached
+by the stable pass. ``fake_inference_server`` with
+``FAKE_PREFILL_SECONDS_PER_KCHAR`` set simulates prefix caching for a dry run.
+"""
+import asyncio
+import os
+import statistics
+import time
+from backends import OpenAICompatibleBackend
+from manifest import build_manifest
+from prompt import SYSTEM_MESSAGE, PromptBuilder, TokenCounter
+from structure import ProjectStructureManager, split_static_files
+
+STACKS = [
+    {"frontend": "nextjs", "backend": "python", "database": "postgres", "authentication": "nextauth", "payments": "stripe"},
+    {"frontend": "react", "backend": "node", "database": "postgres"},
+    {"frontend": "vue", "backend": "python", "database": "supabase", "fileStorage": "s3", "ai": "openai"},
+]
+PROMPTS = [
+    "Build a todo list with due dates and reminders",
+    "Add subscription billing with a pricing page",
+    "Create an admin dashboard with user management",
+    "Build a blog with comments and tags",
+    "Add team workspaces with invitations and roles",
+]
+
+
+def stable_layout(builder: PromptBuilder, manager: ProjectStructureManager, stack, prompt):
+    enhanceable, static = split_static_files(manager.generate_project_structure(stack))
+    manifest, editable, _ = build_manifest(enhanceable, prompt, 8)
+    messages, _ = builder.build(manifest, stack, [], prompt, 4096, static_files=static, editable_files=editable)
+    return messages
+
+
+def variable_first_layout(messages):
+    """The same sections with the per-request part first and instructions last"""
+    instructions = messages[0]["content"][len(SYSTEM_MESSAGE):].strip()
+    stack_context, request_part = messages[1]["content"].split("\n\nFiles To Change:", 1)
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": f"Files To Change:{request_part}\n\n{stack_context}\n\n{instructions}"}
+    ]
+
+
+async def time_to_first_token(backend: OpenAICompatibleBackend, messages) -> float:
+    start = time.perf_counter()
+    stream = await backend.stream_chat_completion(messages, temperature=0.0, max_tokens=8)
+    elapsed = None
+    async for chunk in stream:
+        if elapsed is None and chunk.choices and getattr(chunk.choices[0].delta, "content", None):
+            elapsed = time.perf_counter() - start
+    return elapsed if elapsed is not None else time.perf_counter() - start
+
+
+def summary(name: str, samples) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+    return f"{name:<15} median {statistics.median(ordered) * 1e3:8.1f} ms  p95 {p95 * 1e3:8.1f} ms  mean {statistics.mean(ordered) * 1e3:8.1f} ms"
+
+
+async def main():
+    backend = OpenAICompatibleBackend(
+        model=os.getenv("BENCH_MODEL", "Qwen/Qwen2.5-Coder-7B-Instruct"),
+        embedding_model="",
+        max_concurrency=1,
+        base_url=os.getenv("BENCH_BASE_URL", "http://localhost:8080"),
+        api_key=os.getenv("BENCH_API_KEY"),
+        timeout=600
+    )
+    counter = TokenCounter(backend.model)
+    counter.load()
+    builder = PromptBuilder(counter, context_tokens=32768, prompt_budget=16384)
+    manager = ProjectStructureManager()
+    jobs = [stable_layout(builder, manager, stack, prompt) for stack in STACKS for prompt in PROMPTS]
+
+    try:
+        results = {}
+        for name, layout in (("variable-first", variable_first_layout), ("stable", lambda messages: messages)):
+            results[name] = [await time_to_first_token(backend, layout(messages)) for messages in jobs]
+        print(f"{len(jobs)} requests over {len(STACKS)} stacks")
+        for name, samples in results.items():
+            print(summary(name, samples))
+    finally:
+        await backend.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
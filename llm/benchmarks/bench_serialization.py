@@ -0,0 +1,45 @@
+"""Benchmark turning a memoised base structure into response-ready dicts.
+
+Compares the previous per-request path (Pydantic validation of every file
+followed by a JSON dump/load round trip) with pre-validated records.
+Run from the ``llm`` directory::
+
+    python -m benchmarks.bench_serialization
+"""
+import json
+import timeit
+from models import CustomJSONEncoder, FileStructure
+from benchmarks.bench_structure import TECH_STACK
+from structure import ProjectStructureManager
+
+manager = ProjectStructureManager()
+records = manager.generate_project_records(TECH_STACK)
+files = [record.to_dict() for record in records]
+
+
+def validate_and_round_trip():
+    validated_files = [
+        FileStructure(
+            filename=file["filename"],
+            content=file["content"],
+            language=file["language"]
+        ).model_dump()
+        for file in files
+    ]
+    return json.loads(json.dumps(validated_files, cls=CustomJSONEncoder))
+
+
+def prevalidated_records():
+    return [record.to_dict() for record in records]
+
+
+def main(number: int = 5000):
+    assert validate_and_round_trip() == prevalidated_records()
+    print(f"{len(files)} files per request")
+    for name, func in (("validate + JSON round trip", validate_and_round_trip), ("pre-validated records", prevalidated_records)):
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        print(f"{name:<28} {seconds / number * 1e6:10.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Benchmark per-request base structure generation.
+
+Run from the ``llm`` directory::
+
+    python -m benchmarks.bench_structure
+"""
+import timeit
+from structure import ProjectStructureManager
+
+TECH_STACK = {
+    "frontend": "nextjs",
+    "backend": "python",
+    "database": "postgres",
+    "authentication": "nextauth",
+    "fileStorage": "s3",
+    "payments": "stripe",
+    "ai": "openai"
+}
+
+
+def per_request_manager():
+    ProjectStructureManager().generate_project_structure(TECH_STACK)
+
+
+shared_manager = ProjectStructureManager()
+
+
+def shared_registry():
+    shared_manager.generate_project_structure(TECH_STACK)
+
+
+def main(number: int = 2000):
+    shared_registry()
+    for name, func in (("new manager per request", per_request_manager), ("shared registry", shared_registry)):
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        print(f"{name:<28} {seconds / number * 1e6:10.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
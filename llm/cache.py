@@ -0,0 +1,208 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+import time
+from starlette.concurrency import run_in_threadpool
+
+
+def normalise_prompt(prompt: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share a key"""
+    return re.sub(r"\s+", " ", prompt).strip().lower()
+
+
+def generation_cache_key(
+    tech_stack: Dict[str, str],
+    prompt: str,
+    temperature: float,
+    max_tokens: int,
+    model: str,
+    options: Optional[Dict] = None
+) -> str:
+    """Content-addressed key for a generation request.
+
+    ``options`` holds any other request settings that change the output.
+    """
+    canonical = json.dumps(
+        {
+            "tech_stack": tech_stack,
+            "prompt": normalise_prompt(prompt),
+            "temperature": round(temperature, 4),
+            "max_tokens": max_tokens,
+            "model": model,
+            "options": options or {}
+        },
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def valid_cache_key(key: str) -> bool:
+    """True for keys produced by ``generation_cache_key`` (hex SHA-256 digests)"""
+    return re.fullmatch(r"[0-9a-f]{64}", key) is not None
+
+
+class GenerationCache:
+    """Two-tier TTL/LRU cache for generation responses.
+
+    The in-memory tier is an LRU bounded by ``max_entries``. When
+    ``directory`` is set, entries are also written as JSON files so they
+    survive restarts and can be shared by workers on the same host. The disk
+    tier is bounded by ``max_disk_entries`` and ``max_disk_bytes``, evicting
+    the least recently used files first, and ``sweep`` removes expired ones.
+    An entry stored with ``ttl=None`` never expires. Disk I/O runs in the
+    threadpool.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 3600.0,
+        directory: Optional[str] = None,
+        max_disk_entries: int = 4096,
+        max_disk_bytes: int = 512 * 1024 * 1024
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = await run_in_threadpool(self._read_disk, key)
+            if entry is None:
+                return None
+            self._store_memory(key, entry)
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.time():
+            await self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Dict, deterministic: bool = False) -> None:
+        expires_at = None if deterministic or self.ttl is None else time.time() + self.ttl
+        entry = (expires_at, value)
+        self._store_memory(key, entry)
+        if self.directory:
+            await run_in_threadpool(self._write_disk, key, entry)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self.directory:
+            await run_in_threadpool(self._remove_disk, key)
+
+    async def sweep(self) -> int:
+        """Drop expired entries from both tiers and trim the disk tier; returns files removed"""
+        now = time.time()
+        for key in [key for key, (expires_at, _) in self._entries.items() if expires_at is not None and expires_at < now]:
+            del self._entries[key]
+        if not self.directory:
+            return 0
+        return await run_in_threadpool(self._sweep_disk, now)
+
+    def _store_memory(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    # Entries are stored as a header line with the expiry followed by the
+    # value, so sweeps can check expiry without parsing whole projects
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                expires_at = json.loads(f.readline())["expires_at"]
+                value = json.load(f)
+            # Refresh the access time used for LRU eviction
+            os.utime(path)
+            return expires_at, value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error reading cache entry {key}: {e}")
+            self._remove_disk(key)
+            return None
+
+    def _write_disk(self, key: str, entry: tuple) -> None:
+        expires_at, value = entry
+        temp_path = f"{self._path(key)}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"expires_at": expires_at}) + "\n")
+                json.dump(value, f)
+            os.replace(temp_path, self._path(key))
+        except (OSError, TypeError) as e:
+            print(f"Error writing cache entry {key}: {e}")
+            return
+        self._trim_disk(self._scan_disk())
+
+    def _remove_disk(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing cache entry {key}: {e}")
+
+    def _scan_disk(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, key) of the stored entries, oldest first"""
+        files = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.name[:-len(".json")]))
+        except OSError as e:
+            print(f"Error scanning cache directory: {e}")
+        return sorted(files)
+
+    def _trim_disk(self, files: List[Tuple[float, int, str]]) -> int:
+        total_bytes = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, key in files:
+            if len(files) - removed <= self.max_disk_entries and total_bytes <= self.max_disk_bytes:
+                break
+            self._remove_disk(key)
+            total_bytes -= size
+            removed += 1
+        return removed
+
+    def _sweep_disk(self, now: float) -> int:
+        removed = 0
+        live = []
+        for mtime, size, key in self._scan_disk():
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    expires_at = json.loads(f.readline())["expires_at"]
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError, KeyError, TypeError):
+                expires_at = now - 1
+            if expires_at is not None and expires_at < now:
+                self._remove_disk(key)
+                removed += 1
+            else:
+                live.append((mtime, size, key))
+        return removed + self._trim_disk(live)
@@ -0,0 +1,85 @@
+from typing import Dict, List, Tuple
+from streaming import parse_generation
+
+CONTINUATION_PROMPT = """Your previous response was cut off before the JSON was complete.
+These files are already complete and must NOT be repeated:
+{completed}
+
+Continue the project by generating ONLY the remaining files{resume}, using exactly the same JSON format:
+{{"files": [...], "setup_instructions": "...", "dependencies": {{...}}}}"""
+
+
+async def generate_with_continuation(
+    inference,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    max_rounds: int,
+    token_cap: int
+) -> Tuple[Dict, List[str], Dict]:
+    """Run a generation, issuing follow-up completions while output is truncated.
+
+    A response is considered truncated when the model stopped on its token
+    limit or the JSON document is left unbalanced. Each follow-up resumes
+    after the last complete file and the results are stitched in order.
+    Follow-ups stop after ``max_rounds`` or once ``token_cap`` completion
+    tokens have been spent. Returns the stitched result, the files still
+    lost, and per-round statistics.
+    """
+    files: List[Dict] = []
+    result: Dict = {}
+    lost: List[str] = []
+    all_lost: List[str] = []
+    tokens_used = 0
+    rounds = []
+    round_messages = messages
+
+    for round_number in range(max_rounds + 1):
+        call_tokens = min(max_tokens, token_cap - tokens_used) if round_number else max_tokens
+        if call_tokens <= 0:
+            break
+
+        response = await inference.chat_completion(
+            messages=round_messages,
+            temperature=temperature,
+            max_tokens=call_tokens
+        )
+        if not response or not response.choices:
+            break
+
+        choice = response.choices[0]
+        content = choice.message.content or ""
+        usage = getattr(response, "usage", None)
+        tokens_used += getattr(usage, "completion_tokens", None) or call_tokens
+
+        parser = parse_generation(content)
+        round_result, lost = parser.result()
+        seen = {file.get("filename") for file in files}
+        files.extend(file for file in round_result.get("files", []) if file.get("filename") not in seen)
+        all_lost.extend(name for name in lost if name not in all_lost)
+        round_dependencies = round_result.get("dependencies")
+        dependencies = {
+            **result.get("dependencies", {}),
+            **(round_dependencies if isinstance(round_dependencies, dict) else {})
+        }
+        result = {**result, **round_result, "dependencies": dependencies}
+        rounds.append({"finish_reason": choice.finish_reason, "files": len(round_result.get("files", []))})
+
+        if choice.finish_reason != "length" and not parser.truncated:
+            break
+
+        completed = "\n".join(f"- {file.get('filename')}" for file in files) or "- (none)"
+        resume = f", starting again from {lost[0]}" if lost else ""
+        round_messages = list(messages)
+        if parser.last_file_end:
+            round_messages.append({"role": "assistant", "content": content[:parser.last_file_end]})
+        round_messages.append({
+            "role": "user",
+            "content": CONTINUATION_PROMPT.format(completed=completed, resume=resume)
+        })
+
+    result["files"] = files
+    generated = {file.get("filename") for file in files}
+    lost = [name for name in all_lost if name not in generated]
+    stats = {"rounds": rounds, "completion_tokens": tokens_used}
+    return result, lost, stats
@@ -0,0 +1,101 @@
+"""OpenAI-compatible fake inference server for exercising the inference layer locally.
+
+Run with ``uvicorn fake_inference_server:app --port 8001`` and point the API
+at it with ``INFERENCE_BACKEND=openai INFERENCE_BASE_URL=http://localhost:8001``.
+Behaviour is set by environment variables:
+
+- FAKE_LATENCY_SECONDS: base latency per completion
+- FAKE_SLOW_RATE / FAKE_SLOW_SECONDS: fraction of requests delayed further
+- FAKE_FAILURE_RATE / FAKE_FAILURE_STATUS: fraction of requests failing with a status
+- FAKE_PREFILL_SECONDS_PER_KCHAR: simulated prefill cost per 1000 prompt characters
+  not covered by a cached prefix of an earlier prompt (0 disables the simulation)
+"""
+from collections import deque
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import json
+import os
+import random
+import time
+
+LATENCY_SECONDS = float(os.getenv("FAKE_LATENCY_SECONDS", "0.2"))
+SLOW_RATE = float(os.getenv("FAKE_SLOW_RATE", "0"))
+SLOW_SECONDS = float(os.getenv("FAKE_SLOW_SECONDS", "5"))
+FAILURE_RATE = float(os.getenv("FAKE_FAILURE_RATE", "0"))
+FAILURE_STATUS = int(os.getenv("FAKE_FAILURE_STATUS", "503"))
+PREFILL_SECONDS_PER_KCHAR = float(os.getenv("FAKE_PREFILL_SECONDS_PER_KCHAR", "0"))
+PREFIX_CACHE_SIZE = 64
+
+FAKE_GENERATION = {
+    "files": [
+        {"filename": "README.md", "content": "# Generated project\n", "language": "markdown"}
+    ],
+    "setup_instructions": "Generated by the fake inference server",
+    "dependencies": {}
+}
+
+app = FastAPI(title="Fake inference server")
+prefix_cache = deque(maxlen=PREFIX_CACHE_SIZE)
+
+
+def uncached_chars(prompt: str) -> int:
+    """Prompt characters after the longest prefix shared with a recent prompt"""
+    cached = max((len(os.path.commonprefix([prompt, previous])) for previous in prefix_cache), default=0)
+    prefix_cache.append(prompt)
+    return len(prompt) - cached
+
+
+async def simulate_latency(messages: list):
+    delay = LATENCY_SECONDS
+    if random.random() < SLOW_RATE:
+        delay += SLOW_SECONDS
+    if PREFILL_SECONDS_PER_KCHAR:
+        prompt = "".join(f"{message.get('role')}:{message.get('content')}" for message in messages)
+        delay += uncached_chars(prompt) / 1000 * PREFILL_SECONDS_PER_KCHAR
+    await asyncio.sleep(delay)
+
+
+def completion_chunk(model: str, delta: dict, finish_reason=None) -> str:
+    chunk = {
+        "id": "fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model") or "fake-model"
+
+    if random.random() < FAILURE_RATE:
+        return JSONResponse(status_code=FAILURE_STATUS, content={"error": "Injected failure"})
+    await simulate_latency(body.get("messages", []))
+
+    content = json.dumps(FAKE_GENERATION)
+    if body.get("stream"):
+        async def stream():
+            for start in range(0, len(content), 16):
+                yield completion_chunk(model, {"role": "assistant", "content": content[start:start + 16]})
+                await asyncio.sleep(0.01)
+            yield completion_chunk(model, {}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return {
+        "id": "fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 4, "total_tokens": len(content) // 4}
+    }
@@ -0,0 +1,172 @@
+from typing import Dict, List, Tuple
+import asyncio
+import re
+from prompt import SYSTEM_MESSAGE, compact_json
+from streaming import parse_generation
+
+PLAN_PROMPT = """You are planning a project with this tech stack:
+{tech_stack}
+
+Existing files:
+{file_list}
+
+User's Request: {prompt}
+
+List ONLY the new files the project needs beyond the existing ones. Respond with JSON only:
+{{"files": [{{"filename": "path/to/file", "language": "programming language", "purpose": "one line"}}], "setup_instructions": "setup guide", "dependencies": {{"package_name": "version"}}}}"""
+
+FILE_PROMPT = """You are implementing one file of a project.
+
+Tech Stack Selected:
+{tech_stack}
+
+Project files:
+{file_list}
+
+User's Request: {prompt}
+
+File: {filename} ({language})
+{task}
+
+Follow framework-specific best practices, include proper error handling and type safety, and make sure the file integrates with the rest of the project.
+Return ONLY the complete content of {filename}, without commentary or code fences."""
+
+CODE_FENCE = re.compile(r"^\s*```[\w+-]*\s*\n(.*?)\n?```\s*$", re.DOTALL)
+
+
+def strip_code_fences(content: str) -> str:
+    """Remove a single surrounding markdown code fence, if present"""
+    match = CODE_FENCE.match(content)
+    return match.group(1) if match else content
+
+
+async def plan_new_files(
+    inference,
+    tech_stack: Dict,
+    prompt: str,
+    file_list: str,
+    temperature: float,
+    max_tokens: int
+) -> Dict:
+    """Ask the model which files to add on top of the base structure"""
+    response = await inference.chat_completion(
+        messages=[
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": PLAN_PROMPT.format(
+                tech_stack=compact_json(tech_stack),
+                file_list=file_list,
+                prompt=prompt
+            )}
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+    if not response or not response.choices:
+        return {"files": []}
+    plan, _ = parse_generation(response.choices[0].message.content or "").result()
+    return plan
+
+
+async def generate_file(
+    inference,
+    file: Dict,
+    tech_stack: Dict,
+    prompt: str,
+    file_list: str,
+    temperature: float,
+    max_tokens: int
+) -> Dict:
+    """Generate or enhance a single file with its own completion"""
+    if file.get("content"):
+        task = f"Add the implementation needed for the user's request to this file. Current content:\n{file['content']}"
+    else:
+        task = f"Create this file. Purpose: {file.get('purpose') or 'as required by the project'}"
+
+    response = await inference.chat_completion(
+        messages=[
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": FILE_PROMPT.format(
+                tech_stack=compact_json(tech_stack),
+                file_list=file_list,
+                prompt=prompt,
+                filename=file["filename"],
+                language=file.get("language", "plaintext"),
+                task=task
+            )}
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+    if not response or not response.choices or not response.choices[0].message.content:
+        raise ValueError(f"Empty completion for {file['filename']}")
+
+    return {
+        "filename": file["filename"],
+        "content": strip_code_fences(response.choices[0].message.content),
+        "language": file.get("language", "plaintext")
+    }
+
+
+async def generate_fanout(
+    inference,
+    files: List[Dict],
+    tech_stack: Dict,
+    prompt: str,
+    temperature: float,
+    max_tokens: int,
+    concurrency: int,
+    plan: bool = False
+) -> Tuple[Dict, Dict]:
+    """Generate every file with its own concurrent completion.
+
+    The file list comes from the base structure, optionally extended by a
+    planning call. At most ``concurrency`` file completions run at once, so
+    wall-clock time approaches that of the slowest file rather than the sum
+    of all files. Files whose completion fails keep their base content.
+    Returns the generation result and fan-out statistics.
+    """
+    result = {"files": []}
+    file_list = "\n".join(f"- {file['filename']}" for file in files)
+    targets = list(files)
+    plan_failed = False
+
+    if plan:
+        try:
+            planned = await plan_new_files(inference, tech_stack, prompt, file_list, temperature, max_tokens)
+            existing = {file["filename"] for file in files}
+            new_files = [
+                file for file in planned.get("files", [])
+                if isinstance(file, dict) and file.get("filename") and file["filename"] not in existing
+            ]
+            targets.extend(new_files)
+            file_list += "".join(f"\n- {file['filename']}" for file in new_files)
+            for key in ("setup_instructions", "dependencies"):
+                if planned.get(key):
+                    result[key] = planned[key]
+        except Exception as e:
+            print(f"Error planning project files: {e}")
+            plan_failed = True
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(file: Dict) -> Dict:
+        async with semaphore:
+            return await generate_file(inference, file, tech_stack, prompt, file_list, temperature, max_tokens)
+
+    outcomes = await asyncio.gather(*(run(file) for file in targets), return_exceptions=True)
+
+    failed = []
+    for file, outcome in zip(targets, outcomes):
+        if isinstance(outcome, BaseException):
+            print(f"Error generating {file['filename']}: {outcome}")
+            failed.append(file["filename"])
+        else:
+            result["files"].append(outcome)
+
+    stats = {
+        "planned": len(targets) - len(files),
+        "plan_failed": plan_failed,
+        "generated": len(result["files"]),
+        "failed": failed
+    }
+    return result, stats
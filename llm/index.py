@@ -1,16 +1,39 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Literal
 from dotenv import load_dotenv
-from pymongo import MongoClient
-from huggingface_hub import InferenceClient
+from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import json
 from datetime import datetime
 from bson import ObjectId
 import uvicorn
-from structure import ProjectStructureManager
+from structure import ProjectStructureManager, split_static_files
+from streaming import IncrementalFilesParser, ndjson_event
+from backends import create_backend
+from inference import InferenceService, cancel_on_disconnect
+from resilience import RetryPolicy, deadline_scope
+from router import ModelRouter, Route, parse_routes
+from retrieval import ensure_retrieval_indexes, find_ranked_projects, find_vector_projects
+from vector_index import VectorIndex, load_embeddings
+from manifest import build_manifest, rehydrate
+from prompt import PATCH_INSTRUCTIONS, PROMPT_LAYOUT_VERSION, PromptBuilder, TokenCounter
+from cache import GenerationCache, generation_cache_key, valid_cache_key
+from merge import merge_artifacts
+from continuation import generate_with_continuation
+from fanout import generate_fanout
+from patch import generate_patches
+from coalesce import SingleFlight
+from scheduler import AdmissionController, QueueFullError, parse_priority_classes
+from archive import ARCHIVE_MEDIA_TYPES, archive_etag, archive_size, iter_archive, iter_range, parse_range
+from sessions import (
+    SessionLocks, attribute_layers, delete_session, ensure_session_indexes,
+    load_session, new_session_id, plan_followup, save_session, valid_session_id
+)
 
 # Load environment variables
 load_dotenv()
@@ -27,6 +50,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request fields that tune generation rather than describe the tech stack
+REQUEST_OPTION_FIELDS = ['prompt', 'temperature', 'max_tokens', 'use_cache', 'generation_mode', 'plan_files', 'session_id', 'start_session']
+
 # Pydantic models
 class GenerateRequest(BaseModel):
     frontend: str
@@ -40,11 +66,18 @@ class GenerateRequest(BaseModel):
     prompt: str
     temperature: float = 0.7
     max_tokens: int = 4096
+    use_cache: bool = True
+    generation_mode: Literal["single", "fanout", "patch"] = "single"
+    plan_files: bool = False
+    # Start a session with start_session; follow-ups pass the id returned
+    # in metadata.session.id
+    session_id: Optional[str] = None
+    start_session: bool = False
 
     def get_tech_stack(self) -> Dict[str, str]:
         """Convert request to tech stack dictionary, excluding non-tech fields"""
         return {k: v for k, v in self.model_dump().items() 
-                if k not in ['prompt', 'temperature', 'max_tokens'] 
+                if k not in REQUEST_OPTION_FIELDS
                 and v is not None}
 
 class Artifact(BaseModel):
@@ -56,6 +89,7 @@ class GenerateResponse(BaseModel):
     message: str
     final_code: dict
     auditor_report: dict
+    metadata: dict = {}
 
 # MongoDB connection handler
 class MongoConnection:
@@ -65,13 +99,30 @@ class MongoConnection:
         
     async def connect(self):
         try:
-            self.client = MongoClient(os.getenv("MONGODB_URL"))
+            self.client = AsyncIOMotorClient(
+                os.getenv("MONGODB_URL"),
+                maxPoolSize=int(os.getenv("MONGODB_MAX_POOL_SIZE", "50")),
+                minPoolSize=int(os.getenv("MONGODB_MIN_POOL_SIZE", "5")),
+                serverSelectionTimeoutMS=int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+                connectTimeoutMS=int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+            )
             self.db = self.client[os.getenv("DB_NAME", "boltDB")]
-            self.client.admin.command('ping')
+            await self.client.admin.command('ping')
             print("Connected to MongoDB!")
         except Exception as e:
             print(f"Error connecting to MongoDB: {e}")
             raise e
+
+    async def is_ready(self, timeout: float = 2.0) -> bool:
+        """Check that the server is reachable from the connection pool"""
+        if not self.client:
+            return False
+        try:
+            await asyncio.wait_for(self.client.admin.command('ping'), timeout=timeout)
+            return True
+        except Exception as e:
+            print(f"MongoDB readiness check failed: {e}")
+            return False
         
     async def close(self):
         if self.client:
@@ -79,9 +130,90 @@ class MongoConnection:
 
 # Initialize connections
 mongo = MongoConnection()
-hf_client = InferenceClient(
-    api_key=os.getenv("HUGGINGFACE_API_KEY"),
-    model="Qwen/Qwen2.5-Coder-32B-Instruct"
+structure_manager = ProjectStructureManager()
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "180"))
+INFERENCE_BACKEND_SETTINGS = {
+    "kind": os.getenv("INFERENCE_BACKEND", "hf"),
+    "model": os.getenv("INFERENCE_MODEL", "Qwen/Qwen2.5-Coder-32B-Instruct"),
+    "embedding_model": os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+    "max_concurrency": int(os.getenv("INFERENCE_CONCURRENCY", "32")),
+    "timeout": INFERENCE_TIMEOUT,
+    "api_key": os.getenv("INFERENCE_API_KEY") or os.getenv("HUGGINGFACE_API_KEY"),
+    "base_url": os.getenv("INFERENCE_BASE_URL") or None
+}
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))
+INFERENCE_RETRY_POLICY = RetryPolicy(
+    max_attempts=int(os.getenv("INFERENCE_MAX_ATTEMPTS", "3")),
+    base_delay=float(os.getenv("INFERENCE_RETRY_BASE_DELAY", "0.5")),
+    max_delay=float(os.getenv("INFERENCE_RETRY_MAX_DELAY", "8")),
+    deadline=float(os.getenv("INFERENCE_DEADLINE", "300")),
+    hedge=os.getenv("INFERENCE_HEDGE", "false").lower() == "true",
+    hedge_after=float(os.getenv("INFERENCE_HEDGE_AFTER")) if os.getenv("INFERENCE_HEDGE_AFTER") else None
+)
+
+def create_inference_service(overrides: Dict = None) -> InferenceService:
+    """Inference service for the default backend settings, optionally overridden per route"""
+    settings = dict(INFERENCE_BACKEND_SETTINGS)
+    settings.update({k: v for k, v in (overrides or {}).items() if k in settings})
+    return InferenceService(
+        backend=create_backend(**settings),
+        timeout=INFERENCE_TIMEOUT,
+        retry_policy=INFERENCE_RETRY_POLICY,
+        embedding_concurrency=EMBEDDING_CONCURRENCY
+    )
+
+inference = create_inference_service()
+model_router = ModelRouter(
+    routes=[
+        Route(
+            name=route["name"],
+            service=create_inference_service(route),
+            max_layers=route.get("max_layers"),
+            max_base_files=route.get("max_base_files"),
+            max_prompt_chars=route.get("max_prompt_chars")
+        )
+        for route in parse_routes(os.getenv("MODEL_ROUTES", ""))
+    ],
+    default=Route(name="default", service=inference)
+)
+vector_index = VectorIndex(
+    ivf_threshold=int(os.getenv("VECTOR_INDEX_IVF_THRESHOLD", "50000")),
+    n_probe=int(os.getenv("VECTOR_INDEX_N_PROBE", "8"))
+)
+VECTOR_INDEX_REFRESH_SECONDS = float(os.getenv("VECTOR_INDEX_REFRESH_SECONDS", "300"))
+MERGE_CONFLICT_POLICY = os.getenv("MERGE_CONFLICT_POLICY", "ai")
+CONTINUATION_MAX_ROUNDS = int(os.getenv("CONTINUATION_MAX_ROUNDS", "3"))
+CONTINUATION_TOKEN_CAP = int(os.getenv("CONTINUATION_TOKEN_CAP", "16384"))
+# Optional per-call completion budget; continuations make up the difference
+GENERATION_CALL_MAX_TOKENS = int(os.getenv("GENERATION_CALL_MAX_TOKENS", "0"))
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "8"))
+FANOUT_FILE_MAX_TOKENS = int(os.getenv("FANOUT_FILE_MAX_TOKENS", "2048"))
+generation_cache = GenerationCache(
+    max_entries=int(os.getenv("GENERATION_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("GENERATION_CACHE_TTL", "3600")),
+    directory=os.getenv("GENERATION_CACHE_DIR"),
+    max_disk_entries=int(os.getenv("GENERATION_CACHE_DISK_ENTRIES", "4096")),
+    max_disk_bytes=int(os.getenv("GENERATION_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+)
+GENERATION_CACHE_SWEEP_SECONDS = float(os.getenv("GENERATION_CACHE_SWEEP_SECONDS", "600"))
+generation_flights = SingleFlight()
+admission = AdmissionController(
+    max_active=int(os.getenv("ADMISSION_MAX_ACTIVE", "16")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+    priority_classes=parse_priority_classes(os.getenv("ADMISSION_PRIORITY_CLASSES", "enterprise:0,plus:1,free:2"))
+)
+# Proxies allowed to assert X-User-Id / X-User-Plan after authenticating the caller
+ADMISSION_TRUSTED_PROXIES = {
+    host.strip() for host in os.getenv("ADMISSION_TRUSTED_PROXIES", "").split(",") if host.strip()
+}
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+session_locks = SessionLocks()
+PROMPT_COMPACT_MANIFEST = os.getenv("PROMPT_COMPACT_MANIFEST", "true").lower() == "true"
+PROMPT_FULL_BODY_FILES = int(os.getenv("PROMPT_FULL_BODY_FILES", "8"))
+prompt_builder = PromptBuilder(
+    counter=TokenCounter(os.getenv("TOKENIZER_MODEL", inference.model)),
+    context_tokens=int(os.getenv("MODEL_CONTEXT_TOKENS", "32768")),
+    prompt_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "16384"))
 )
 
 class MongoJSONEncoder(json.JSONEncoder):
@@ -104,205 +236,580 @@ def serialize_mongo_data(data: any) -> any:
         return data.isoformat()
     return data
 
-async def find_similar_projects(tech_stack: dict) -> List[dict]:
-    """Find similar projects from MongoDB based on tech stack"""
+async def find_similar_projects(tech_stack: dict, prompt: str) -> List[dict]:
+    """Find the most similar projects by embedding, falling back to tech stack matches"""
     try:
-        query = {
-            "$or": [
-                {key: value} for key, value in tech_stack.items() 
-                if value and key != "blockchain"
-            ]
-        }
-        
-        results = list(mongo.db.training_data.find(
-            query,
-            {'embedding': 0}
-        ))
-        
-        serialized_results = serialize_mongo_data(results)
-        
-        if not serialized_results:
-            broader_query = {
-                "$or": [
-                    {"backend": tech_stack['backend']},
-                    {"appType": {"$regex": "storage", "$options": "i"}}
-                ]
-            }
-            broader_results = list(mongo.db.training_data.find(
-                broader_query,
-                {'embedding': 0}
-            ))
-            serialized_results = serialize_mongo_data(broader_results)
-            
-        return serialized_results
+        results = []
+        if len(vector_index):
+            try:
+                query_vector = await inference.embed(
+                    f"{prompt}\n{json.dumps(tech_stack, sort_keys=True)}"
+                )
+                results = await find_vector_projects(
+                    mongo.db.training_data,
+                    vector_index,
+                    query_vector
+                )
+            except Exception as e:
+                print(f"Error in vector retrieval, falling back to stack match: {e}")
+
+        if not results:
+            results = await find_ranked_projects(mongo.db.training_data, tech_stack)
+        return serialize_mongo_data(results)
             
     except Exception as e:
         print(f"Error finding similar projects: {e}")
         return []
 
+def prompt_files(files: List[Dict], prompt: str) -> tuple:
+    """Base file manifest, files to change in full, and the names only outlined"""
+    if not PROMPT_COMPACT_MANIFEST:
+        return files, [], []
+    return build_manifest(files, prompt, PROMPT_FULL_BODY_FILES)
+
+def template_only_files(summarised: List[str], static: List[Dict]) -> List[str]:
+    """Files the model only saw by name or outline, whose returned bodies are discarded"""
+    return summarised + [file["filename"] for file in static]
+
+def default_enhancement() -> Dict:
+    """Enhancement result used when the model returns nothing usable"""
+    return {
+        "files": [],
+        "setup_instructions": "Follow setup instructions in generated files",
+        "dependencies": {}
+    }
+
 async def enhance_project_structure(
     base_structure: List[Dict],
     tech_stack: Dict,
     similar_projects: List[Dict],
     prompt: str,
     temperature: float,
-    max_tokens: int
+    max_tokens: int,
+    service: InferenceService
 ) -> Dict:
     """Enhance base project structure using AI"""
+    enhanceable, static = split_static_files(base_structure)
+    manifest, editable, summarised = prompt_files(enhanceable, prompt)
+    messages, prompt_tokens = prompt_builder.build(
+        manifest,
+        tech_stack,
+        serialize_mongo_data(similar_projects),
+        prompt,
+        max_tokens,
+        static_files=static,
+        editable_files=editable
+    )
+    enhanced = default_enhancement()
+    lost_files = []
+    continuation = {}
+    error = None
+
     try:
-        serialized_base = serialize_mongo_data(base_structure)
-        serialized_tech = serialize_mongo_data(tech_stack)
-        serialized_similar = serialize_mongo_data(similar_projects)
-
-        system_prompt = f"""Enhance and complete this project structure:
-
-Current Structure:
-{json.dumps(serialized_base, indent=2)}
-
-Tech Stack Selected:
-{json.dumps(serialized_tech, indent=2)}
-
-Similar Projects Reference:
-{json.dumps(serialized_similar, indent=2)}
-
-User's Request: {prompt}
-
-Requirements:
-1. Maintain the exact structure provided above
-2. Add necessary implementation code to existing files
-3. Only create new files if absolutely necessary
-4. Follow framework-specific best practices
-5. Include proper error handling and type safety
-6. Add comprehensive documentation and comments
-7. Ensure proper integration between all layers
-
-Generate ONLY a JSON response in this format:
-{{
-    "files": [
-        {{
-            "filename": "path/to/file",
-            "content": "file content",
-            "language": "programming language"
-        }}
-    ],
-    "setup_instructions": "detailed setup guide including environment variables and dependencies",
-    "dependencies": {{
-        "package_name": "version"
-    }}
-}}"""
-
-        response = hf_client.chat_completion(
-            model="Qwen/Qwen2.5-Coder-32B-Instruct",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "You are an expert full-stack developer specializing in modern web frameworks and best practices."
-                },
-                {"role": "user", "content": system_prompt}
-            ],
-            temperature=temperature,
-            max_tokens=max_tokens
+        call_max_tokens = min(max_tokens, GENERATION_CALL_MAX_TOKENS or max_tokens)
+        result, lost_files, continuation = await generate_with_continuation(
+            service,
+            messages,
+            temperature,
+            call_max_tokens,
+            max_rounds=CONTINUATION_MAX_ROUNDS,
+            token_cap=max(CONTINUATION_TOKEN_CAP, max_tokens)
         )
-        
-        if not response or not response.choices:
-            return {
-                "files": [],
-                "setup_instructions": "Follow setup instructions in generated files",
-                "dependencies": {}
-            }
-            
-        try:
-            content = response.choices[0].message.content
-            cleaned_content = content.strip().strip('`').strip()
-            if cleaned_content.startswith('json'):
-                cleaned_content = cleaned_content[4:]
-            return json.loads(cleaned_content)
-        except (json.JSONDecodeError, AttributeError) as e:
-            print(f"Error parsing AI response: {e}")
-            return {
-                "files": [],
-                "setup_instructions": "Follow setup instructions in generated files",
-                "dependencies": {}
-            }
+        enhanced.update(result)
+        enhanced["files"], rehydrated = rehydrate(enhanced.get("files", []), template_only_files(summarised, static))
+        if rehydrated:
+            print(f"Kept template content for {rehydrated} summarised or fixed files returned by the model")
             
     except Exception as e:
         print(f"Error enhancing project structure: {e}")
-        return {
-            "files": [],
-            "setup_instructions": "Follow setup instructions in generated files",
-            "dependencies": {}
-        }
+        error = f"{type(e).__name__}: {e}"
+
+    prompt_tokens["files_summarised"] = len(summarised)
+    enhanced["prompt_tokens"] = prompt_tokens
+    enhanced["lost_files"] = lost_files
+    enhanced["continuation"] = continuation
+    enhanced["generation_error"] = error
+    return enhanced
+
+
+async def fanout_project_structure(
+    base_structure: List[Dict],
+    tech_stack: Dict,
+    prompt: str,
+    temperature: float,
+    max_tokens: int,
+    plan: bool,
+    service: InferenceService
+) -> Dict:
+    """Enhance base project structure with one concurrent completion per file"""
+    enhanced = default_enhancement()
+    fanout = {}
+
+    try:
+        enhanceable, static = split_static_files(base_structure)
+        result, fanout = await generate_fanout(
+            service,
+            enhanceable,
+            tech_stack,
+            prompt,
+            temperature,
+            min(max_tokens, FANOUT_FILE_MAX_TOKENS),
+            concurrency=FANOUT_CONCURRENCY,
+            plan=plan
+        )
+        enhanced.update(result)
+        fanout["static_files_skipped"] = len(static)
+
+    except Exception as e:
+        print(f"Error in fan-out generation: {e}")
+
+    enhanced["fanout"] = fanout
+    return enhanced
+
+
+async def patch_project_structure(
+    base_structure: List[Dict],
+    tech_stack: Dict,
+    similar_projects: List[Dict],
+    prompt: str,
+    temperature: float,
+    max_tokens: int,
+    service: InferenceService
+) -> Dict:
+    """Enhance base project structure by applying model-written edits to the templates"""
+    enhanceable, static = split_static_files(base_structure)
+    # Edits to summarised files are still checked against their real content
+    manifest, editable, summarised = prompt_files(enhanceable, prompt)
+    messages, prompt_tokens = prompt_builder.build(
+        manifest,
+        tech_stack,
+        serialize_mongo_data(similar_projects),
+        prompt,
+        max_tokens,
+        static_files=static,
+        editable_files=editable,
+        instructions=PATCH_INSTRUCTIONS
+    )
+    enhanced = default_enhancement()
+    patch = {}
+    error = None
+
+    try:
+        result, patch = await generate_patches(
+            service,
+            messages,
+            enhanceable,
+            tech_stack,
+            prompt,
+            temperature,
+            max_tokens,
+            regenerate_max_tokens=min(max_tokens, FANOUT_FILE_MAX_TOKENS),
+            concurrency=FANOUT_CONCURRENCY,
+            fixed_files=static
+        )
+        enhanced.update(result)
 
+    except Exception as e:
+        print(f"Error in patch generation: {e}")
+        error = f"{type(e).__name__}: {e}"
+
+    prompt_tokens["files_summarised"] = len(summarised)
+    enhanced["prompt_tokens"] = prompt_tokens
+    enhanced["patch"] = patch
+    enhanced["generation_error"] = error
+    return enhanced
+
+
+async def refresh_vector_index():
+    """Periodically add newly stored training documents to the vector index"""
+    while True:
+        await asyncio.sleep(VECTOR_INDEX_REFRESH_SECONDS)
+        try:
+            added = await load_embeddings(vector_index, mongo.db.training_data)
+            if added:
+                print(f"Added {added} documents to the vector index")
+        except Exception as e:
+            print(f"Error refreshing vector index: {e}")
+
+async def sweep_generation_cache():
+    """Periodically remove expired generation cache entries and trim the disk tier"""
+    while True:
+        await asyncio.sleep(GENERATION_CACHE_SWEEP_SECONDS)
+        try:
+            removed = await generation_cache.sweep()
+            if removed:
+                print(f"Removed {removed} generation cache files")
+        except Exception as e:
+            print(f"Error sweeping generation cache: {e}")
 
 @app.on_event("startup")
 async def startup_event():
+    # The tokenizer may be downloaded; token counts are estimated until it is ready
+    app.state.tokenizer_task = asyncio.create_task(run_in_threadpool(prompt_builder.counter.load))
     await mongo.connect()
+    await ensure_retrieval_indexes(mongo.db.training_data)
+    await ensure_session_indexes(mongo.db.sessions, SESSION_TTL_SECONDS)
+    try:
+        loaded = await load_embeddings(vector_index, mongo.db.training_data)
+        print(f"Loaded {loaded} documents into the vector index")
+    except Exception as e:
+        print(f"Error building vector index: {e}")
+    app.state.vector_refresh_task = asyncio.create_task(refresh_vector_index())
+    app.state.cache_sweep_task = asyncio.create_task(sweep_generation_cache())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    app.state.vector_refresh_task.cancel()
+    app.state.cache_sweep_task.cancel()
+    for service in model_router.services():
+        await service.close()
     await mongo.close()
 
+def route_generation(request: GenerateRequest, tech_stack: Dict) -> tuple:
+    """Pick the inference service for a request based on the size of the job"""
+    base_files = len(structure_manager.generate_project_records(tech_stack))
+    return model_router.route(tech_stack, base_files, request.prompt)
+
+def generation_complete(enhanced: Dict) -> bool:
+    """True when every part of a generation succeeded, so it is safe to cache"""
+    fanout = enhanced.get("fanout", {})
+    patch = enhanced.get("patch", {})
+    unrecovered = set(patch.get("failed", [])) - set(patch.get("regenerated", []))
+    return bool(
+        enhanced.get("files")
+        and not enhanced.get("generation_error")
+        and not enhanced.get("lost_files")
+        and not fanout.get("failed")
+        and not fanout.get("plan_failed")
+        and patch.get("finish_reason") != "length"
+        and not unrecovered
+    )
+
+async def run_generation(
+    request: GenerateRequest,
+    tech_stack: Dict,
+    cache_key: str,
+    service: InferenceService,
+    routing: Dict
+) -> GenerateResponse:
+    """Generate, merge and cache a project for a single request"""
+    # Generate base structure from the shared template registry
+    base_structure = structure_manager.generate_project_structure(tech_stack)
+    
+    # Generate enhanced structure; continuation rounds, fan-out files and
+    # patch regenerations all share one deadline
+    with deadline_scope(INFERENCE_RETRY_POLICY.deadline):
+        if request.generation_mode == "fanout":
+            enhanced_structure = await fanout_project_structure(
+                base_structure,
+                tech_stack,
+                request.prompt,
+                request.temperature,
+                request.max_tokens,
+                request.plan_files,
+                service
+            )
+        elif request.generation_mode == "patch":
+            similar_projects = await find_similar_projects(tech_stack, request.prompt)
+            enhanced_structure = await patch_project_structure(
+                base_structure,
+                tech_stack,
+                similar_projects,
+                request.prompt,
+                request.temperature,
+                request.max_tokens,
+                service
+            )
+        else:
+            similar_projects = await find_similar_projects(tech_stack, request.prompt)
+            enhanced_structure = await enhance_project_structure(
+                base_structure,
+                tech_stack,
+                similar_projects,
+                request.prompt,
+                request.temperature,
+                request.max_tokens,
+                service
+            )
+
+    # Ensure we have a valid enhanced_structure
+    if not enhanced_structure:
+        enhanced_structure = default_enhancement()
+    
+    # Merge base structure with AI enhancements
+    final_structure = merge_artifacts(
+        base_structure,
+        enhanced_structure.get("files", []),
+        policy=MERGE_CONFLICT_POLICY
+    )
+    
+    response = GenerateResponse(
+        message="Project generated successfully!",
+        final_code={"artifacts": final_structure},
+        auditor_report={
+            "vulnerabilities_found": False,
+            "vulnerabilities_list": [],
+            "recommendations": enhanced_structure.get("setup_instructions", "Follow setup instructions in generated files")
+        },
+        metadata={
+            "prompt_tokens": enhanced_structure.get("prompt_tokens", {}),
+            "lost_files": enhanced_structure.get("lost_files", []),
+            "continuation": enhanced_structure.get("continuation", {}),
+            "fanout": enhanced_structure.get("fanout", {}),
+            "patch": enhanced_structure.get("patch", {}),
+            "generation_error": enhanced_structure.get("generation_error"),
+            "generation_mode": request.generation_mode,
+            "routing": routing,
+            "cache": "miss" if request.use_cache else "bypass"
+        }
+    )
+
+    # Only cache complete generations where the model contributed files
+    if request.use_cache and generation_complete(enhanced_structure):
+        # Lets clients download the cached project as an archive
+        response.metadata["cache_key"] = cache_key
+        await generation_cache.set(
+            cache_key,
+            response.model_dump(),
+            deterministic=request.temperature == 0
+        )
+
+    return response
+
+def request_identity(http_request: Request) -> tuple:
+    """User id and billing plan used for admission fairness and priority.
+
+    The identity headers are only honoured from a trusted proxy; any other
+    caller is identified by address and gets the default priority class.
+    """
+    client_host = http_request.client.host if http_request.client else "anonymous"
+    if client_host not in ADMISSION_TRUSTED_PROXIES:
+        return client_host, None
+    return (
+        http_request.headers.get("X-User-Id") or client_host,
+        http_request.headers.get("X-User-Plan")
+    )
+
+async def admitted_generation(
+    request: GenerateRequest,
+    tech_stack: Dict,
+    cache_key: str,
+    service: InferenceService,
+    routing: Dict,
+    user_id: str,
+    plan: Optional[str]
+) -> GenerateResponse:
+    """Run a generation once the admission controller grants a slot"""
+    async with admission.slot(user_id, plan) as waited:
+        response = await run_generation(request, tech_stack, cache_key, service, routing)
+    return response.model_copy(update={
+        "metadata": {**response.metadata, "queue_wait_seconds": round(waited, 3)}
+    })
+
+def request_cache_key(request: GenerateRequest, tech_stack: Dict, service: InferenceService) -> str:
+    return generation_cache_key(
+        tech_stack,
+        request.prompt,
+        request.temperature,
+        request.max_tokens,
+        service.model,
+        options={
+            "generation_mode": request.generation_mode,
+            "plan_files": request.plan_files,
+            "prompt_layout": PROMPT_LAYOUT_VERSION
+        }
+    )
+
+async def followup_generation(request: GenerateRequest, tech_stack: Dict, session: Dict) -> GenerateResponse:
+    """Apply a follow-up turn to a session's artifacts, regenerating only what it affects.
+
+    Layers whose templates differ under the new tech stack are reset and
+    sent in full together with the files most relevant to the prompt; the
+    model answers with edits, so output size follows the size of the change.
+    """
+    followup = plan_followup(
+        session,
+        structure_manager.generate_project_structure(session["tech_stack"]),
+        structure_manager.generate_project_structure(tech_stack),
+        structure_manager.generate_layer_map(tech_stack)
+    )
+    enhanceable, static = split_static_files(followup["artifacts"])
+    manifest, editable, _ = build_manifest(
+        enhanceable,
+        request.prompt,
+        PROMPT_FULL_BODY_FILES,
+        include=followup["affected_files"]
+    )
+    service, routing = model_router.route(tech_stack, len(editable), request.prompt)
+    messages, prompt_tokens = prompt_builder.build(
+        manifest,
+        tech_stack,
+        [],
+        request.prompt,
+        request.max_tokens,
+        static_files=static,
+        editable_files=editable,
+        instructions=PATCH_INSTRUCTIONS
+    )
+    result, patch, error = {"files": []}, {}, None
+
+    try:
+        with deadline_scope(INFERENCE_RETRY_POLICY.deadline):
+            result, patch = await generate_patches(
+                service,
+                messages,
+                enhanceable,
+                tech_stack,
+                request.prompt,
+                request.temperature,
+                request.max_tokens,
+                regenerate_max_tokens=min(request.max_tokens, FANOUT_FILE_MAX_TOKENS),
+                concurrency=FANOUT_CONCURRENCY,
+                fixed_files=static
+            )
+    except Exception as e:
+        print(f"Error in follow-up generation: {e}")
+        error = f"{type(e).__name__}: {e}"
+
+    final_structure = merge_artifacts(followup["artifacts"], result.get("files", []), policy="ai")
+    return GenerateResponse(
+        message="Project updated successfully!",
+        final_code={"artifacts": final_structure},
+        auditor_report={
+            "vulnerabilities_found": False,
+            "vulnerabilities_list": [],
+            "recommendations": result.get("setup_instructions")
+                or session.get("setup_instructions")
+                or "Follow setup instructions in generated files"
+        },
+        metadata={
+            "prompt_tokens": prompt_tokens,
+            "patch": patch,
+            "generation_error": error,
+            "generation_mode": "patch",
+            "routing": routing,
+            "cache": "bypass",
+            "session": {
+                "incremental": True,
+                "affected_layers": followup["affected_layers"],
+                "reset_files": followup["reset"],
+                "dropped_files": followup["dropped"],
+                "files_to_change": [file["filename"] for file in editable],
+                "reused_files": len(followup["artifacts"]) - len(result.get("files", []))
+            }
+        }
+    )
+
+async def session_generation(
+    request: GenerateRequest,
+    tech_stack: Dict,
+    session_id: str,
+    user_id: str,
+    plan: Optional[str]
+) -> GenerateResponse:
+    """Run one turn of a persisted session: a full generation first, incremental follow-ups after"""
+    collection = mongo.db.sessions
+    async with session_locks.hold(session_id):
+        session = None
+        if not request.start_session:
+            session = await load_session(collection, session_id)
+            if session is None:
+                raise HTTPException(status_code=404, detail="Session not found")
+        if session is None:
+            service, routing = route_generation(request, tech_stack)
+            response = await admitted_generation(
+                request,
+                tech_stack,
+                request_cache_key(request, tech_stack, service),
+                service,
+                routing,
+                user_id,
+                plan
+            )
+            metadata = {**response.metadata, "session": {"incremental": False}}
+        else:
+            async with admission.slot(user_id, plan) as waited:
+                response = await followup_generation(request, tech_stack, session)
+            metadata = {**response.metadata, "queue_wait_seconds": round(waited, 3)}
+
+        artifacts = response.final_code["artifacts"]
+        await save_session(
+            collection,
+            session_id,
+            tech_stack,
+            artifacts,
+            attribute_layers(artifacts, structure_manager.generate_layer_map(tech_stack)),
+            response.auditor_report.get("recommendations", ""),
+            turn={
+                "prompt": request.prompt,
+                "tech_stack": tech_stack,
+                "incremental": metadata["session"]["incremental"],
+                "affected_layers": metadata["session"].get("affected_layers", []),
+                "changed_files": metadata.get("patch", {}).get("files_changed")
+            }
+        )
+        turn_number = len(session.get("turns", [])) + 1 if session else 1
+        metadata["session"] = {**metadata["session"], "id": session_id, "turn": turn_number}
+        return response.model_copy(update={"metadata": metadata})
+
 @app.post("/generate", response_model=GenerateResponse)
-async def generate_project(request: GenerateRequest):
+async def generate_project(request: GenerateRequest, http_request: Request):
     try:
         # Get tech stack from request
         tech_stack = request.get_tech_stack()
-        
-        # Initialize structure manager and generate base structure
-        structure_manager = ProjectStructureManager()
-        base_structure = structure_manager.generate_project_structure(tech_stack)
-        
-        # Find similar projects
-        similar_projects = await find_similar_projects(tech_stack)
-        
-        # Generate enhanced structure
-        enhanced_structure = await enhance_project_structure(
-            base_structure,
-            tech_stack,
-            similar_projects,
-            request.prompt,
-            request.temperature,
-            request.max_tokens
+        user_id, plan = request_identity(http_request)
+        if request.start_session or request.session_id is not None:
+            if request.start_session and request.session_id is not None:
+                raise HTTPException(status_code=400, detail="start_session cannot be combined with session_id")
+            session_id = new_session_id() if request.start_session else request.session_id
+            if not valid_session_id(session_id):
+                raise HTTPException(status_code=404, detail="Session not found")
+            return await cancel_on_disconnect(
+                http_request,
+                session_generation(request, tech_stack, session_id, user_id, plan)
+            )
+
+        service, routing = route_generation(request, tech_stack)
+
+        # Serve identical requests from the generation cache
+        cache_key = request_cache_key(request, tech_stack, service)
+        if not request.use_cache:
+            return await cancel_on_disconnect(
+                http_request,
+                admitted_generation(request, tech_stack, cache_key, service, routing, user_id, plan)
+            )
+
+        cached = await generation_cache.get(cache_key)
+        if cached is not None:
+            return GenerateResponse(**{
+                **cached,
+                "metadata": {**cached.get("metadata", {}), "cache": "hit"}
+            })
+
+        # Identical in-flight requests share one generation; each waiter
+        # stops waiting when its own client goes away
+        response, shared = await cancel_on_disconnect(
+            http_request,
+            generation_flights.do(
+                cache_key,
+                lambda: admitted_generation(request, tech_stack, cache_key, service, routing, user_id, plan)
+            )
         )
+        return response.model_copy(update={
+            "metadata": {**response.metadata, "coalesced": shared}
+        })
         
-        # Ensure we have a valid enhanced_structure
-        if not enhanced_structure:
-            enhanced_structure = {
-                "files": [],
-                "setup_instructions": "Follow setup instructions in generated files",
-                "dependencies": {}
-            }
-        
-        # Merge base structure with AI enhancements
-        final_structure = []
-        base_files = {f["filename"]: f for f in base_structure}
-        
-        # Process each file from AI response
-        for file in enhanced_structure.get("files", []):
-            if file["filename"] in base_files:
-                base_files[file["filename"]].update(file)
-                final_structure.append(base_files[file["filename"]])
-            else:
-                final_structure.append(file)
-        
-        # Add remaining base files
-        for base_file in base_structure:
-            if base_file["filename"] not in {f["filename"] for f in final_structure}:
-                final_structure.append(base_file)
-        
-        # Sort files for consistency
-        final_structure.sort(key=lambda x: x["filename"])
-        
-        return GenerateResponse(
-            message="Project generated successfully!",
-            final_code={"artifacts": final_structure},
-            auditor_report={
-                "vulnerabilities_found": False,
-                "vulnerabilities_list": [],
-                "recommendations": enhanced_structure.get("setup_instructions", "Follow setup instructions in generated files")
-            }
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
-        
+    except ConnectionAbortedError as e:
+        print(f"Generation cancelled: {str(e)}")
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         print(f"Error in generate_project: {str(e)}")
         raise HTTPException(
@@ -310,9 +817,228 @@ async def generate_project(request: GenerateRequest):
             detail=f"Failed to generate project: {str(e)}"
         )
 
+@app.post("/generate/stream")
+async def generate_project_stream(request: GenerateRequest, http_request: Request):
+    """Stream generated files as newline-delimited JSON events.
+
+    Base structure files are emitted before the model is called, then every
+    AI file is pushed as soon as it is complete. An AI file supersedes a
+    previously emitted file with the same filename. Cached generations are
+    replayed as cache files, and complete streamed generations are cached
+    like those of ``/generate``. Only single-response generation without a
+    session can be streamed.
+    """
+    if request.generation_mode != "single":
+        raise HTTPException(status_code=400, detail="Streaming only supports generation_mode 'single'")
+    if request.session_id is not None or request.start_session:
+        raise HTTPException(status_code=400, detail="Sessions are not supported when streaming; use /generate")
+    if admission.is_full():
+        raise HTTPException(
+            status_code=503,
+            detail="Generation queue is full",
+            headers={"Retry-After": str(admission.retry_after())}
+        )
+    user_id, plan = request_identity(http_request)
+
+    try:
+        tech_stack = request.get_tech_stack()
+        base_structure = structure_manager.generate_project_structure(tech_stack)
+        service, routing = route_generation(request, tech_stack)
+        cache_key = request_cache_key(request, tech_stack, service)
+        cached = await generation_cache.get(cache_key) if request.use_cache else None
+    except Exception as e:
+        print(f"Error in generate_project_stream: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate project: {str(e)}"
+        )
+
+    async def cached_stream():
+        for file in cached["final_code"]["artifacts"]:
+            yield ndjson_event("file", source="cache", file=file)
+        yield ndjson_event(
+            "done",
+            setup_instructions=cached["auditor_report"].get("recommendations", "Follow setup instructions in generated files"),
+            dependencies={},
+            prompt_tokens=cached.get("metadata", {}).get("prompt_tokens", {}),
+            lost_files=[],
+            queue_wait_seconds=None,
+            routing=routing,
+            cache="hit",
+            cache_key=cache_key
+        )
+
+    async def event_stream():
+        for base_file in base_structure:
+            yield ndjson_event("file", source="base", file=base_file)
+
+        similar_projects = await find_similar_projects(tech_stack, request.prompt)
+        enhanceable, static = split_static_files(base_structure)
+        manifest, editable, summarised = prompt_files(enhanceable, request.prompt)
+        template_only = template_only_files(summarised, static)
+        messages, prompt_tokens = prompt_builder.build(
+            manifest,
+            tech_stack,
+            serialize_mongo_data(similar_projects),
+            request.prompt,
+            request.max_tokens,
+            static_files=static,
+            editable_files=editable
+        )
+
+        parser = IncrementalFilesParser()
+        queue_wait_seconds = None
+        ai_files, error = [], None
+        try:
+            async with admission.slot(user_id, plan) as waited:
+                queue_wait_seconds = round(waited, 3)
+                token_stream = service.stream_chat_completion(
+                    messages=messages,
+                    temperature=request.temperature,
+                    max_tokens=request.max_tokens
+                )
+                async for delta in token_stream:
+                    for file in parser.feed(delta):
+                        # Summarised and fixed files keep the base content already emitted
+                        if rehydrate([file], template_only)[0]:
+                            ai_files.append(file)
+                            yield ndjson_event("file", source="ai", file=file)
+        except QueueFullError as e:
+            error = str(e)
+            yield ndjson_event("error", detail=str(e), retry_after=e.retry_after)
+        except Exception as e:
+            print(f"Error streaming project enhancement: {e}")
+            error = str(e)
+            yield ndjson_event("error", detail=str(e))
+
+        result, lost_files = parser.result()
+        stored_key = None
+        # Same rule as /generate: only complete generations with model files are cached
+        if request.use_cache and ai_files and not lost_files and error is None:
+            response = GenerateResponse(
+                message="Project generated successfully!",
+                final_code={"artifacts": merge_artifacts(base_structure, ai_files, policy=MERGE_CONFLICT_POLICY)},
+                auditor_report={
+                    "vulnerabilities_found": False,
+                    "vulnerabilities_list": [],
+                    "recommendations": result.get("setup_instructions", "Follow setup instructions in generated files")
+                },
+                metadata={
+                    "prompt_tokens": prompt_tokens,
+                    "generation_mode": "single",
+                    "routing": routing,
+                    "cache": "miss",
+                    "cache_key": cache_key
+                }
+            )
+            await generation_cache.set(cache_key, response.model_dump(), deterministic=request.temperature == 0)
+            stored_key = cache_key
+        yield ndjson_event(
+            "done",
+            setup_instructions=result.get("setup_instructions", "Follow setup instructions in generated files"),
+            dependencies=result.get("dependencies", {}),
+            prompt_tokens=prompt_tokens,
+            lost_files=lost_files,
+            queue_wait_seconds=queue_wait_seconds,
+            routing=routing,
+            cache="miss" if request.use_cache else "bypass",
+            cache_key=stored_key
+        )
+
+    stream = cached_stream() if cached is not None else event_stream()
+    return StreamingResponse(stream, media_type="application/x-ndjson")
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = await load_session(mongo.db.sessions, session_id) if valid_session_id(session_id) else None
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return serialize_mongo_data({
+        "session_id": session["_id"],
+        "tech_stack": session.get("tech_stack", {}),
+        "artifacts": session.get("artifacts", []),
+        "setup_instructions": session.get("setup_instructions", ""),
+        "turns": session.get("turns", [])
+    })
+
+@app.delete("/sessions/{session_id}")
+async def remove_session(session_id: str):
+    if not valid_session_id(session_id) or not await delete_session(mongo.db.sessions, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"deleted": session_id}
+
+async def archive_response(http_request: Request, files: List[Dict], archive_format: str, name: str) -> Response:
+    """Stream files as a deterministic archive, honouring single byte ranges"""
+    if archive_format not in ARCHIVE_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported archive format, expected one of {', '.join(ARCHIVE_MEDIA_TYPES)}"
+        )
+    etag = await run_in_threadpool(archive_etag, files, archive_format, name)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{name}.{archive_format}"',
+        "Accept-Ranges": "bytes",
+        "ETag": etag
+    }
+    media_type = ARCHIVE_MEDIA_TYPES[archive_format]
+
+    range_header = http_request.headers.get("range")
+    if_range = http_request.headers.get("if-range")
+    if range_header and (not if_range or if_range == etag):
+        # The archive is rebuilt identically, so a range is served by
+        # skipping ahead in a fresh stream rather than storing the archive
+        size = await run_in_threadpool(archive_size, files, archive_format, name)
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError as e:
+            raise HTTPException(status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return StreamingResponse(
+                iter_range(iter_archive(files, archive_format, name), start, end),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(end - start + 1)
+                }
+            )
+
+    return StreamingResponse(iter_archive(files, archive_format, name), media_type=media_type, headers=headers)
+
+@app.get("/sessions/{session_id}/download")
+async def download_session(session_id: str, http_request: Request, format: str = "zip"):
+    """Download the latest artifacts of a session as a ZIP or tar.gz archive"""
+    session = await load_session(mongo.db.sessions, session_id) if valid_session_id(session_id) else None
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return await archive_response(http_request, session.get("artifacts", []), format, session_id)
+
+@app.get("/generations/{cache_key}/download")
+async def download_generation(cache_key: str, http_request: Request, format: str = "zip"):
+    """Download a cached generation (see ``metadata.cache_key``) as a ZIP or tar.gz archive"""
+    cached = await generation_cache.get(cache_key) if valid_cache_key(cache_key) else None
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Generation not found or expired")
+    return await archive_response(http_request, cached["final_code"]["artifacts"], format, "project")
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    if not await mongo.is_ready():
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unhealthy", "mongodb": "unavailable"}
+        )
+    return {"status": "healthy", "mongodb": "ready"}
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "admission": admission.metrics(),
+        "inference": model_router.metrics(),
+        "inflight_generations": len(generation_flights)
+    }
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,141 @@
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import time
+import numpy as np
+from backends import InferenceBackend
+from resilience import LatencyTracker, RetryPolicy, call_with_resilience
+
+
+class InferenceService:
+    """Async chat completion client with bounded concurrency and timeouts.
+
+    Calls are delegated to an ``InferenceBackend``, which also names the
+    model. Every chat completion goes through a semaphore sized to the
+    backend's concurrency limit so a single worker can keep many
+    generations in flight without flooding the provider, and each
+    call is bounded by a per-request timeout. Transient failures are
+    retried according to ``retry_policy``, which also sets the overall
+    deadline and whether slow completions are hedged. Embeddings have their
+    own ``embedding_concurrency`` limit so short retrieval queries never
+    queue behind long generations.
+    """
+
+    def __init__(
+        self,
+        backend: InferenceBackend,
+        timeout: float = 180.0,
+        retry_policy: Optional[RetryPolicy] = None,
+        embedding_concurrency: int = 8
+    ):
+        self.backend = backend
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=1, deadline=timeout)
+        self.latency = LatencyTracker()
+        self.stats: Dict[str, int] = {"calls": 0, "retries": 0, "hedged": 0, "failures": 0}
+        self._semaphore = asyncio.Semaphore(backend.max_concurrency)
+        self._embedding_semaphore = asyncio.Semaphore(embedding_concurrency)
+
+    @property
+    def model(self) -> str:
+        return self.backend.model
+
+    async def _resilient(self, call, hedge: bool = False):
+        self.stats["calls"] += 1
+        try:
+            return await call_with_resilience(
+                call, self.retry_policy, self.latency, hedge=hedge, stats=self.stats
+            )
+        except Exception:
+            self.stats["failures"] += 1
+            raise
+
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ):
+        """Run a chat completion with retries and optional hedging, returning the full response"""
+        async def attempt():
+            async with self._semaphore:
+                started = time.monotonic()
+                response = await asyncio.wait_for(
+                    self.backend.chat_completion(messages, temperature, max_tokens),
+                    timeout=self.timeout
+                )
+                self.latency.record(time.monotonic() - started)
+                return response
+
+        return await self._resilient(attempt, hedge=self.retry_policy.hedge)
+
+    async def embed(self, text: str) -> List[float]:
+        """Embed text with the embedding model, mean-pooling token vectors if needed"""
+        async def attempt():
+            async with self._embedding_semaphore:
+                return await asyncio.wait_for(
+                    self.backend.feature_extraction(text),
+                    timeout=self.timeout
+                )
+
+        vector = await self._resilient(attempt)
+        vector = np.asarray(vector, dtype=np.float32)
+        while vector.ndim > 1:
+            vector = vector.mean(axis=0)
+        return vector.tolist()
+
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> AsyncIterator[str]:
+        """Run a streaming chat completion and yield text deltas as they arrive.
+
+        Opening the stream is retried; once deltas have been yielded a
+        failure propagates, since a partial stream cannot be replayed.
+        """
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout
+            token_stream = await self._resilient(
+                lambda: asyncio.wait_for(
+                    self.backend.stream_chat_completion(messages, temperature, max_tokens),
+                    timeout=max(deadline - loop.time(), 0)
+                )
+            )
+            iterator = token_stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        iterator.__anext__(),
+                        timeout=max(deadline - loop.time(), 0)
+                    )
+                except StopAsyncIteration:
+                    break
+                if not chunk.choices:
+                    continue
+                delta = getattr(chunk.choices[0].delta, "content", None)
+                if delta:
+                    yield delta
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def metrics(self) -> Dict[str, float]:
+        return {**self.stats, "backend": self.backend.name, "model": self.model, "latency_p50": self.latency.percentile(0.5), "latency_p95": self.latency.percentile(0.95)}
+
+
+async def cancel_on_disconnect(http_request, awaitable, poll_interval: float = 1.0):
+    """Await ``awaitable`` but cancel it as soon as the HTTP client goes away"""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                raise ConnectionAbortedError("Client disconnected before generation finished")
+    finally:
+        if not task.done():
+            task.cancel()
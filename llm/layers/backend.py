@@ -1,13 +1,14 @@
 # backend_templates.py
 from typing import Dict, List, Any
+from layers.registry import TemplateRegistry
 
 class BackendTemplatesManager:
-    def _initialize_backend_templates(self) -> Dict[str, Any]:
-        return {
-            "node": self._get_node_structure(),
-            "python": self._get_python_structure(),
-            "rust": self._get_rust_structure()
-        }
+    def _initialize_backend_templates(self) -> TemplateRegistry:
+        return TemplateRegistry({
+            "node": self._get_node_structure,
+            "python": self._get_python_structure,
+            "rust": self._get_rust_structure
+        })
 
     def _generate_backend_files(self, backend: str, frontend: str) -> List[Dict[str, str]]:
         try:
@@ -1,37 +1,15 @@
 # frontend_templates.py
 from typing import Dict, List, Any
+from layers.registry import TemplateRegistry
 
 class FrontendTemplatesManager:
-    def _initialize_frontend_templates(self) -> Dict[str, Any]:
-        return {
-            "nextjs": {
-                "base_structure": {
-                    "app": {
-                        "layout.tsx": self._next_layout_template(),
-                        "page.tsx": self._next_page_template(),
-                        "components": {
-                            "ui": {},
-                            "shared": {}
-                        },
-                        "lib": {
-                            "utils.ts": self._next_utils_template()
-                        },
-                        "styles": {
-                            "globals.css": self._next_globals_css()
-                        }
-                    },
-                    "public": {},
-                    "package.json": self._next_package_template(),
-                    "next.config.js": self._next_config_template(),
-                    "tsconfig.json": self._ts_config_template(),
-                    "tailwind.config.js": self._tailwind_config_template(),
-                    "postcss.config.js": self._postcss_config_template()
-                }
-            },
-            "react": self._get_react_structure(),
-            "vue": self._get_vue_structure(),
-            "angular": self._get_angular_structure()
-        }
+    def _initialize_frontend_templates(self) -> TemplateRegistry:
+        return TemplateRegistry({
+            "nextjs": self._get_nextjs_structure,
+            "react": self._get_react_structure,
+            "vue": self._get_vue_structure,
+            "angular": self._get_angular_structure
+        })
 
     def _generate_frontend_files(self, frontend: str) -> List[Dict[str, str]]:
         try:
@@ -50,6 +28,32 @@ class FrontendTemplatesManager:
             print(f"Error generating frontend files: {str(e)}")
             return []
 
+    def _get_nextjs_structure(self) -> Dict[str, Any]:
+        return {
+            "base_structure": {
+                "app": {
+                    "layout.tsx": self._next_layout_template(),
+                    "page.tsx": self._next_page_template(),
+                    "components": {
+                        "ui": {},
+                        "shared": {}
+                    },
+                    "lib": {
+                        "utils.ts": self._next_utils_template()
+                    },
+                    "styles": {
+                        "globals.css": self._next_globals_css()
+                    }
+                },
+                "public": {},
+                "package.json": self._next_package_template(),
+                "next.config.js": self._next_config_template(),
+                "tsconfig.json": self._ts_config_template(),
+                "tailwind.config.js": self._tailwind_config_template(),
+                "postcss.config.js": self._postcss_config_template()
+            }
+        }
+
     def _get_react_structure(self) -> Dict[str, Any]:
         return {
             "base_structure": {
@@ -0,0 +1,38 @@
+# registry.py
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator
+
+
+def freeze_structure(structure: Any) -> Any:
+    """Recursively wrap nested template dicts in read-only mapping proxies"""
+    if isinstance(structure, Mapping):
+        return MappingProxyType({key: freeze_structure(value) for key, value in structure.items()})
+    return structure
+
+
+class TemplateRegistry(Mapping):
+    """Read-only mapping of framework name to template structure.
+
+    Each framework's structure is built by its builder on first access,
+    frozen, and shared by every subsequent lookup, so frameworks a process
+    never serves are never built.
+    """
+
+    def __init__(self, builders: Dict[str, Callable[[], Dict[str, Any]]]):
+        self._builders = dict(builders)
+        self._templates: Dict[str, Any] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._templates:
+            self._templates[name] = freeze_structure(self._builders[name]())
+        return self._templates[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._builders
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._builders)
+
+    def __len__(self) -> int:
+        return len(self._builders)
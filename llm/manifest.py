@@ -0,0 +1,131 @@
+from typing import Dict, Iterable, List, Set, Tuple
+import hashlib
+import json
+import re
+from merge import normalise_path
+
+# Declarations worth showing in a file outline
+OUTLINE_PATTERN = re.compile(
+    r"^\s*(?:"
+    r"export\s+(?:default\s+)?(?:async\s+)?(?:function|class|const|let|interface|type|enum)\b"
+    r"|(?:async\s+)?(?:function|def|class)\s+\w+"
+    r"|@\w+(?:\.\w+)*\("
+    r"|model\s+\w+\s*\{"
+    r"|create\s+table\b"
+    r"|(?:pub\s+)?(?:async\s+)?(?:fn|struct|enum|impl)\b"
+    r")",
+    re.IGNORECASE
+)
+OUTLINE_MAX_LINES = 12
+OUTLINE_LINE_CHARS = 120
+
+# Files at or below this size are cheaper to send whole than to outline
+SMALL_FILE_CHARS = 300
+
+# Configuration and tooling files the model should leave alone unless asked
+CONFIG_FILE_PATTERN = re.compile(
+    r"(^|/)(package(-lock)?\.json|tsconfig[^/]*\.json|[^/]*\.config\.[cm]?[jt]s|\.eslintrc[^/]*|"
+    r"\.prettierrc[^/]*|requirements\.txt|pyproject\.toml|cargo\.toml|dockerfile|\.gitignore|\.env[^/]*)$",
+    re.IGNORECASE
+)
+
+WORD_PATTERN = re.compile(r"[A-Za-z][a-z0-9]+|[A-Z]+(?![a-z])")
+STOP_WORDS = frozenset({
+    "the", "and", "for", "with", "that", "this", "app", "application", "create", "build",
+    "make", "want", "need", "should", "using", "use", "add", "from", "into", "page", "file"
+})
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+
+
+def outline(filename: str, content: str) -> List[str]:
+    """Signature lines of a file, or its top-level keys for JSON documents"""
+    if filename.endswith(".json"):
+        try:
+            document = json.loads(content)
+            if isinstance(document, dict):
+                return list(document)[:OUTLINE_MAX_LINES]
+        except ValueError:
+            pass
+    lines = []
+    for line in content.splitlines():
+        if OUTLINE_PATTERN.match(line):
+            lines.append(line.strip()[:OUTLINE_LINE_CHARS])
+            if len(lines) == OUTLINE_MAX_LINES:
+                break
+    return lines
+
+
+def words(text: str) -> Set[str]:
+    return {word.lower() for word in WORD_PATTERN.findall(text)} - STOP_WORDS
+
+
+def relevance(file: Dict, prompt_words: Set[str], prompt: str) -> float:
+    """How likely the request is to change ``file``"""
+    filename = file["filename"]
+    basename = filename.rsplit("/", 1)[-1]
+    if CONFIG_FILE_PATTERN.search(filename):
+        return 1.0 if basename.lower() in prompt.lower() else -1.0
+    # Matches in the path count double; source files are the usual targets of implementation work
+    score = 2 * len(prompt_words & words(filename)) + len(prompt_words & words(file.get("content", "")))
+    return score + (0.5 if file.get("language", "plaintext") != "plaintext" else 0.0)
+
+
+def build_manifest(
+    files: List[Dict],
+    prompt: str,
+    full_body_files: int,
+    include: Iterable[str] = ()
+) -> Tuple[List[Dict], List[Dict], List[str]]:
+    """Compact prompt representation of the base files.
+
+    Files small enough that outlining them saves nothing keep their content;
+    every other file is reduced to its path, language, content hash and
+    outline. The manifest does not depend on the request, so it can sit in
+    the cacheable prompt prefix. The ``full_body_files`` outlined files most
+    relevant to the request, plus any named in ``include``, are returned
+    separately with their content.
+    Returns the manifest in the original order, the files to change, and
+    the names of the remaining outlined files, which are restored from the
+    templates afterwards.
+    """
+    prompt_words = words(prompt)
+    candidates = [
+        (relevance(file, prompt_words, prompt), index)
+        for index, file in enumerate(files)
+        if len(file.get("content", "")) > SMALL_FILE_CHARS
+    ]
+    ranked = sorted((item for item in candidates if item[0] > 0), key=lambda item: (-item[0], item[1]))
+    outlined = {index for _, index in candidates}
+    required = {normalise_path(name) for name in include}
+    expanded = sorted(
+        {index for _, index in ranked[:full_body_files]}
+        | {index for index in outlined if normalise_path(files[index]["filename"]) in required}
+    )
+    summarised = outlined - set(expanded)
+
+    entries = []
+    for index, file in enumerate(files):
+        if index in outlined:
+            entries.append({
+                "filename": file["filename"],
+                "language": file.get("language", "plaintext"),
+                "hash": content_hash(file.get("content", "")),
+                "outline": outline(file["filename"], file.get("content", ""))
+            })
+        else:
+            entries.append(file)
+    return entries, [files[index] for index in expanded], [files[index]["filename"] for index in sorted(summarised)]
+
+
+def rehydrate(generated: List[Dict], summarised: List[str]) -> Tuple[List[Dict], int]:
+    """Drop generated copies of summarised files so their template content is kept.
+
+    The model only saw an outline or the name of these files, so any body
+    it returns for them would be a reconstruction rather than an edit.
+    """
+    names = {normalise_path(name) for name in summarised}
+    kept = [file for file in generated if normalise_path(file.get("filename") or "") not in names]
+    return kept, len(generated) - len(kept)
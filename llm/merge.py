@@ -0,0 +1,48 @@
+from typing import Dict, Iterable, List
+import posixpath
+
+# How to resolve a file present in both the base structure and the AI output
+CONFLICT_POLICIES = ("ai", "base")
+
+
+def normalise_path(filename: str) -> str:
+    """Canonical form of a file path used to detect duplicates"""
+    path = filename.replace("\\", "/").strip()
+    path = posixpath.normpath(path).lstrip("/")
+    return "" if path == "." else path
+
+
+def merge_artifacts(
+    base_files: Iterable[Dict],
+    generated_files: Iterable[Dict],
+    policy: str = "ai"
+) -> List[Dict]:
+    """Merge AI-generated files into the base structure.
+
+    Files are keyed by normalised path. With the ``ai`` policy a generated
+    file's fields override the base file's; with ``base`` the template wins
+    and only new files are taken from the AI output. Inputs are never
+    mutated and the result is sorted by filename, so the merge is
+    O(n log n) in the total number of files.
+    """
+    if policy not in CONFLICT_POLICIES:
+        raise ValueError(f"Unknown merge policy: {policy}")
+
+    merged: Dict[str, Dict] = {}
+    for file in base_files:
+        merged[normalise_path(file["filename"])] = file
+
+    for file in generated_files:
+        filename = file.get("filename") if isinstance(file, dict) else None
+        if not filename:
+            continue
+        path = normalise_path(filename)
+        if not path:
+            continue
+        existing = merged.get(path)
+        if existing is None:
+            merged[path] = {**file, "filename": path}
+        elif policy == "ai":
+            merged[path] = {**existing, **file, "filename": existing["filename"]}
+
+    return sorted(merged.values(), key=lambda file: file["filename"])
@@ -1,4 +1,5 @@
 # models.py
+from dataclasses import dataclass
 from typing import Dict, List, Any, Optional
 from pydantic import BaseModel
 import json
@@ -29,6 +30,29 @@ class FileStructure(BaseModel):
             "language": self.language
         }
 
+@dataclass(frozen=True, slots=True)
+class FileRecord:
+    """Immutable, pre-validated template file shared between requests"""
+    filename: str
+    content: str
+    language: str
+
+    @classmethod
+    def from_file(cls, file: Dict[str, Any]) -> "FileRecord":
+        validated = FileStructure(
+            filename=file["filename"],
+            content=file["content"],
+            language=file["language"]
+        )
+        return cls(validated.filename, validated.content, validated.language)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            "filename": self.filename,
+            "content": self.content,
+            "language": self.language
+        }
+
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, ObjectId):
@@ -37,4 +61,6 @@ class CustomJSONEncoder(json.JSONEncoder):
             return obj.isoformat()
         if isinstance(obj, BaseModel):
             return obj.model_dump()
+        if isinstance(obj, FileRecord):
+            return obj.to_dict()
         return super().default(obj)
\ No newline at end of file
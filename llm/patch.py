@@ -0,0 +1,195 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json
+import re
+from fanout import generate_file
+from merge import normalise_path
+from structure import LANGUAGE_MAP
+
+EDIT_BLOCK = re.compile(
+    r"^FILE:[ \t]*(?P<filename>\S+)[ \t]*\n"
+    r"<<<<<<< SEARCH[ \t]*\n(?P<search>.*?)^=======[ \t]*\n(?P<replace>.*?)^>>>>>>> REPLACE[ \t]*$",
+    re.MULTILINE | re.DOTALL
+)
+META_LINE = re.compile(r"^META:[ \t]*(?P<meta>\{.*\})[ \t]*$", re.MULTILINE)
+
+
+def detect_language(filename: str) -> str:
+    return LANGUAGE_MAP.get(filename.rsplit(".", 1)[-1].lower(), "plaintext")
+
+
+def parse_edit_blocks(text: str) -> Tuple[List[Dict[str, str]], Dict]:
+    """Extract search/replace edit blocks and the trailing META object.
+
+    A block cut off by the token limit has no REPLACE marker and is
+    ignored, so a truncated response still yields its complete edits.
+    """
+    edits = [
+        {
+            "filename": normalise_path(match.group("filename")),
+            "search": match.group("search"),
+            "replace": match.group("replace")
+        }
+        for match in EDIT_BLOCK.finditer(text)
+    ]
+    meta = {}
+    for match in META_LINE.finditer(text):
+        try:
+            meta = json.loads(match.group("meta"))
+        except json.JSONDecodeError as e:
+            print(f"Error parsing patch metadata: {e}")
+    return edits, meta if isinstance(meta, dict) else {}
+
+
+def _find_loose(content: str, search: str) -> Optional[Tuple[int, int]]:
+    """Locate ``search`` ignoring trailing whitespace on each line"""
+    wanted = [line.rstrip() for line in search.rstrip("\n").split("\n")]
+    lines = content.split("\n")
+    offsets, offset = [], 0
+    for line in lines:
+        offsets.append(offset)
+        offset += len(line) + 1
+    for start in range(len(lines) - len(wanted) + 1):
+        if all(lines[start + i].rstrip() == wanted[i] for i in range(len(wanted))):
+            end_line = start + len(wanted) - 1
+            return offsets[start], offsets[end_line] + len(lines[end_line])
+    return None
+
+
+def apply_edit(content: str, search: str, replace: str) -> Optional[str]:
+    """Apply one search/replace edit, returning None when ``search`` is not found"""
+    if not search.strip():
+        # An empty search block appends to the file
+        return content + ("" if not content or content.endswith("\n") else "\n") + replace
+    index = content.find(search)
+    if index >= 0:
+        return content[:index] + replace + content[index + len(search):]
+    span = _find_loose(content, search)
+    if span is None:
+        return None
+    start, end = span
+    return content[:start] + replace.rstrip("\n") + content[end:]
+
+
+def apply_edits(
+    base_files: List[Dict],
+    edits: List[Dict[str, str]],
+    fixed_files: Iterable[Dict] = ()
+) -> Tuple[List[Dict], List[str], List[str]]:
+    """Apply edits to the base files.
+
+    ``fixed_files`` are base files that must stay as they are; edits to
+    them are skipped rather than mistaken for new files.
+    Returns the changed and newly created files with full content, the
+    names of files whose edits could not be applied (left out of the
+    result so they can be regenerated), and the names of skipped files:
+    fixed files, and unknown files that were edited rather than created.
+    """
+    originals = {normalise_path(file["filename"]): file for file in base_files}
+    fixed = {normalise_path(file["filename"]) for file in fixed_files}
+    contents: Dict[str, str] = {}
+    failed: List[str] = []
+    skipped: List[str] = []
+
+    for edit in edits:
+        filename = edit["filename"]
+        if filename in failed or filename in skipped:
+            continue
+        if filename in fixed:
+            skipped.append(filename)
+            continue
+        current = contents.get(filename, originals[filename]["content"] if filename in originals else None)
+        if current is None:
+            if edit["search"].strip():
+                skipped.append(filename)
+                continue
+            current = ""
+        patched = apply_edit(current, edit["search"], edit["replace"])
+        if patched is None:
+            failed.append(filename)
+            contents.pop(filename, None)
+        else:
+            contents[filename] = patched
+
+    files = [
+        {
+            "filename": originals[filename]["filename"] if filename in originals else filename,
+            "content": content,
+            "language": originals[filename]["language"] if filename in originals else detect_language(filename)
+        }
+        for filename, content in contents.items()
+    ]
+    return files, failed, skipped
+
+
+async def generate_patches(
+    inference,
+    messages: List[Dict[str, str]],
+    base_files: List[Dict],
+    tech_stack: Dict,
+    prompt: str,
+    temperature: float,
+    max_tokens: int,
+    regenerate_max_tokens: int,
+    concurrency: int,
+    fixed_files: Iterable[Dict] = ()
+) -> Tuple[Dict, Dict]:
+    """Generate edits against the base files and apply them server-side.
+
+    Base files whose edits fail to apply are regenerated with a
+    full-content completion each, at most ``concurrency`` at a time; if
+    that fails too they keep their base content. Files the model created
+    and then failed to edit have no template to regenerate from and are
+    reported as lost. Edits to ``fixed_files`` are skipped. Returns the
+    generation result and patch statistics.
+    """
+    response = await inference.chat_completion(
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+    content = ""
+    if response and response.choices:
+        content = response.choices[0].message.content or ""
+    edits, meta = parse_edit_blocks(content)
+    files, failed, skipped = apply_edits(base_files, edits, fixed_files)
+
+    originals = {normalise_path(file["filename"]): file for file in base_files}
+    lost = [filename for filename in failed if filename not in originals]
+    regenerable = [filename for filename in failed if filename in originals]
+    regenerated = []
+    if regenerable:
+        file_list = "\n".join(f"- {file['filename']}" for file in base_files)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def regenerate(filename: str) -> Dict:
+            async with semaphore:
+                return await generate_file(
+                    inference, originals[filename], tech_stack, prompt, file_list, temperature, regenerate_max_tokens
+                )
+
+        outcomes = await asyncio.gather(*(regenerate(name) for name in regenerable), return_exceptions=True)
+        for filename, outcome in zip(regenerable, outcomes):
+            if isinstance(outcome, BaseException):
+                print(f"Error regenerating {filename} after failed patch: {outcome}")
+            else:
+                files.append(outcome)
+                regenerated.append(filename)
+
+    result = {"files": files}
+    for key in ("setup_instructions", "dependencies"):
+        if meta.get(key):
+            result[key] = meta[key]
+
+    usage = getattr(response, "usage", None)
+    stats = {
+        "edits": len(edits),
+        "files_changed": len(files),
+        "failed": failed,
+        "regenerated": regenerated,
+        "lost": lost,
+        "skipped": skipped,
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "finish_reason": response.choices[0].finish_reason if response and response.choices else None
+    }
+    return result, stats
@@ -0,0 +1,249 @@
+from typing import Any, Dict, List, Tuple
+import json
+
+# Bump whenever the wording or order of the prompt changes; it is part of
+# the generation cache key and invalidates server-side prefix caches
+PROMPT_LAYOUT_VERSION = 2
+
+SYSTEM_MESSAGE = "You are an expert full-stack developer specializing in modern web frameworks and best practices."
+
+GENERATION_INSTRUCTIONS = """You enhance and complete generated project structures.
+
+The user message describes the project in these sections:
+- Tech Stack Selected: the frameworks and services chosen
+- Current Structure: every project file; files given as "outline" and "hash" instead of "content" are complete
+- Fixed Files: files that are complete as-is
+- Files To Change: full content of the files the request is expected to modify
+- Similar Projects Reference: related projects for inspiration
+- User's Request: what to build
+
+Requirements:
+1. Maintain the exact structure provided
+2. Add necessary implementation code to the Files To Change and to files given with content
+3. Never include outlined or fixed files in your response
+4. Only create new files if absolutely necessary
+5. Follow framework-specific best practices
+6. Include proper error handling and type safety
+7. Add comprehensive documentation and comments
+8. Ensure proper integration between all layers
+
+Generate ONLY a JSON response in this format:
+{
+    "files": [
+        {
+            "filename": "path/to/file",
+            "content": "file content",
+            "language": "programming language"
+        }
+    ],
+    "setup_instructions": "detailed setup guide including environment variables and dependencies",
+    "dependencies": {
+        "package_name": "version"
+    }
+}"""
+
+PATCH_INSTRUCTIONS = """You implement requests as edits to generated project structures.
+
+The user message describes the project in these sections:
+- Tech Stack Selected: the frameworks and services chosen
+- Current Structure: every project file; files given as "outline" and "hash" instead of "content" are complete
+- Fixed Files: files that are complete as-is
+- Files To Change: full content of the files the request is expected to modify
+- Similar Projects Reference: related projects for inspiration
+- User's Request: what to build
+
+Requirements:
+1. Change only what the request needs; never repeat unchanged code
+2. Only edit the Files To Change and files given with content; never edit outlined or fixed files
+3. Only create new files if absolutely necessary
+4. Follow framework-specific best practices
+5. Include proper error handling and type safety
+6. Ensure proper integration between all layers
+
+Respond ONLY with search/replace edit blocks, one per change:
+FILE: path/to/file
+<<<<<<< SEARCH
+exact lines copied from the current file
+=======
+replacement lines
+>>>>>>> REPLACE
+
+Keep each SEARCH section short but unique within its file. To create a new file, or to append to one, leave SEARCH empty.
+Finish with a single line:
+META: {"setup_instructions": "setup guide including environment variables", "dependencies": {"package_name": "version"}}"""
+
+# Identical for every request with the same tech stack
+STACK_CONTEXT_TEMPLATE = """Tech Stack Selected:
+{tech_stack}
+
+Current Structure:
+{base_structure}
+
+Fixed Files:
+{static_files}"""
+
+# Varies per request, so it always comes last
+REQUEST_TEMPLATE = """
+
+Files To Change:
+{editable_files}
+
+Similar Projects Reference:
+{similar_projects}
+
+User's Request: {prompt}"""
+
+# Fields kept when a similar project has to be summarised to fit the budget
+SUMMARY_FIELDS = ["frontend", "backend", "database", "authentication", "fileStorage",
+                  "payments", "ai", "appType", "description", "relevance"]
+SUMMARY_TEXT_LIMIT = 280
+
+
+def compact_json(data: Any) -> str:
+    """Serialise without indentation or padding whitespace"""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+class TokenCounter:
+    """Count tokens with the model tokenizer, estimating until it is loaded.
+
+    ``load`` may download the tokenizer, so it blocks; call it off the event
+    loop. Counting never triggers a load.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._tokenizer = None
+
+    def load(self):
+        try:
+            from tokenizers import Tokenizer
+            self._tokenizer = Tokenizer.from_pretrained(self.model)
+        except Exception as e:
+            print(f"Tokenizer for {self.model} unavailable, estimating token counts: {e}")
+
+    def count(self, text: str) -> int:
+        if self._tokenizer is None:
+            return (len(text) + 3) // 4
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+class PromptBuilder:
+    """Assemble the enhancement prompt within a token budget.
+
+    The prompt is laid out as a stable prefix followed by the variable part.
+    The system message (role and output instructions) and the stack context
+    (tech stack, file manifest and fixed files) come first; they are shared
+    by every request with the same stack, so servers with prefix caching can
+    reuse them. The files to change, similar projects and the user's request
+    follow.
+
+    Fixed sections (instructions, stack context, files to change and the
+    user's request) are always included. Similar projects are added in relevance
+    order, summarised when the full document does not fit, and dropped once
+    the budget is exhausted.
+    """
+
+    def __init__(self, counter: TokenCounter, context_tokens: int, prompt_budget: int):
+        self.counter = counter
+        self.context_tokens = context_tokens
+        self.prompt_budget = prompt_budget
+
+    def budget_for(self, max_tokens: int) -> int:
+        """Prompt tokens available once the completion budget is reserved"""
+        return max(min(self.prompt_budget, self.context_tokens - max_tokens), 0)
+
+    def build(
+        self,
+        base_structure: List[Dict],
+        tech_stack: Dict,
+        similar_projects: List[Dict],
+        prompt: str,
+        max_tokens: int,
+        static_files: List[Dict] = (),
+        editable_files: List[Dict] = (),
+        instructions: str = GENERATION_INSTRUCTIONS
+    ) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+        """Return chat messages and the per-section token breakdown.
+
+        ``static_files`` are listed by name only; their bodies never reach
+        the model and are returned from the templates unchanged.
+        ``editable_files`` are sent in full after the stable prefix.
+        ``instructions`` selects the output format, e.g. ``PATCH_INSTRUCTIONS``.
+        """
+        budget = self.budget_for(max_tokens)
+        system = f"{SYSTEM_MESSAGE}\n\n{instructions}"
+        sections = {
+            "tech_stack": compact_json(tech_stack),
+            "base_structure": compact_json(base_structure),
+            "static_files": compact_json([file["filename"] for file in static_files]),
+            "editable_files": compact_json(list(editable_files)),
+            "prompt": prompt
+        }
+        breakdown = {name: self.counter.count(text) for name, text in sections.items()}
+        breakdown["system"] = self.counter.count(SYSTEM_MESSAGE)
+        breakdown["instructions"] = self.counter.count(system) - breakdown["system"] + self.counter.count(
+            STACK_CONTEXT_TEMPLATE.format(tech_stack="", base_structure="", static_files="")
+            + REQUEST_TEMPLATE.format(editable_files="", similar_projects="", prompt="")
+        )
+
+        remaining = budget - sum(breakdown.values())
+        included, summarised, similar_tokens = [], 0, 0
+        for project in similar_projects:
+            for candidate in (project, self._summarise(project)):
+                # Account for the separating comma inside the JSON array
+                tokens = self.counter.count(compact_json(candidate)) + 1
+                if tokens <= remaining:
+                    included.append(candidate)
+                    summarised += candidate is not project
+                    similar_tokens += tokens
+                    remaining -= tokens
+                    break
+            else:
+                break
+
+        sections["similar_projects"] = compact_json(included)
+        breakdown["similar_projects"] = similar_tokens
+        breakdown["total"] = sum(breakdown.values())
+        stack_context = STACK_CONTEXT_TEMPLATE.format(
+            tech_stack=sections["tech_stack"],
+            base_structure=sections["base_structure"],
+            static_files=sections["static_files"]
+        )
+        breakdown["stable_prefix"] = self.counter.count(system) + self.counter.count(stack_context)
+        breakdown["layout_version"] = PROMPT_LAYOUT_VERSION
+        breakdown["budget"] = budget
+        breakdown["similar_projects_included"] = len(included)
+        breakdown["similar_projects_summarised"] = summarised
+        breakdown["similar_projects_dropped"] = len(similar_projects) - len(included)
+        breakdown["static_tokens_saved"] = (
+            self.counter.count(compact_json(list(static_files))) - breakdown["static_files"]
+            if static_files else 0
+        )
+
+        request_part = REQUEST_TEMPLATE.format(
+            editable_files=sections["editable_files"],
+            similar_projects=sections["similar_projects"],
+            prompt=prompt
+        )
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": stack_context + request_part}
+        ]
+        return messages, breakdown
+
+    def _summarise(self, project: Dict) -> Dict:
+        summary = {}
+        for field in SUMMARY_FIELDS:
+            value = project.get(field)
+            if value is None:
+                continue
+            if isinstance(value, str) and len(value) > SUMMARY_TEXT_LIMIT:
+                value = value[:SUMMARY_TEXT_LIMIT] + "..."
+            summary[field] = value
+        if isinstance(project.get("files"), list):
+            summary["files"] = [
+                file.get("filename") for file in project["files"]
+                if isinstance(file, dict) and file.get("filename")
+            ]
+        return summary
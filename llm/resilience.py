@@ -0,0 +1,154 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+import asyncio
+import random
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Transport-level errors from the HTTP clients used by the inference backends
+RETRYABLE_ERROR_MODULES = ("httpx", "aiohttp")
+
+# Absolute event loop time by which every inference call of the current
+# request must finish; tasks started within the request inherit it
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+@dataclass
+class RetryPolicy:
+    """Retry, deadline and hedging settings for inference calls.
+
+    ``hedge_after`` is a fixed hedging delay in seconds; when ``hedge`` is
+    enabled without it, the observed p95 latency is used once enough calls
+    have been recorded.
+    """
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    deadline: float = 300.0
+    hedge: bool = False
+    hedge_after: Optional[float] = None
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[None]:
+    """Bound all inference calls made inside the block by ``seconds`` in total.
+
+    A nested scope can only shorten the deadline of the one around it.
+    """
+    deadline = asyncio.get_running_loop().time() + seconds
+    current = request_deadline.get()
+    token = request_deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        request_deadline.reset(token)
+
+
+def status_code_of(error: BaseException) -> Optional[int]:
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    return status or getattr(error, "status", None)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for timeouts, connection failures and throttling/server errors"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = status_code_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    if type(error).__name__ == "InferenceTimeoutError":
+        return True
+    return type(error).__module__.split(".")[0] in RETRYABLE_ERROR_MODULES
+
+
+def backoff_delay(policy: RetryPolicy, attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * 2 ** attempt))
+
+
+async def _hedged(call: Callable[[], Awaitable[Any]], hedge_after: float, stats: Dict[str, int]) -> Any:
+    """Start a second attempt if the first is slower than ``hedge_after``; first success wins"""
+    first = asyncio.ensure_future(call())
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if not done:
+            stats["hedged"] = stats.get("hedged", 0) + 1
+            pending.add(asyncio.ensure_future(call()))
+
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_with_resilience(
+    call: Callable[[], Awaitable[Any]],
+    policy: RetryPolicy,
+    latency: Optional[LatencyTracker] = None,
+    hedge: Optional[bool] = None,
+    stats: Optional[Dict[str, int]] = None
+) -> Any:
+    """Run ``call`` with retries, backoff, an overall deadline and optional hedging.
+
+    The deadline is the policy's, or the request's from ``deadline_scope``
+    when that ends sooner. Only errors accepted by ``is_retryable`` are
+    retried; anything else, or the last attempt's error, propagates. Retry
+    and hedge counts are added to ``stats`` when given.
+    """
+    stats = {} if stats is None else stats
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + policy.deadline
+    if request_deadline.get() is not None:
+        deadline = min(deadline, request_deadline.get())
+    hedge = policy.hedge if hedge is None else hedge
+
+    for attempt in range(policy.max_attempts):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("Inference deadline exceeded")
+
+        hedge_after = policy.hedge_after
+        if hedge and hedge_after is None and latency is not None:
+            hedge_after = latency.percentile(0.95)
+
+        try:
+            if hedge and hedge_after is not None:
+                return await asyncio.wait_for(_hedged(call, hedge_after, stats), timeout=remaining)
+            return await asyncio.wait_for(call(), timeout=remaining)
+        except Exception as e:
+            last_attempt = attempt == policy.max_attempts - 1
+            if last_attempt or not is_retryable(e):
+                raise
+            delay = min(backoff_delay(policy, attempt), max(deadline - loop.time(), 0))
+            stats["retries"] = stats.get("retries", 0) + 1
+            print(f"Inference attempt {attempt + 1} failed ({e}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
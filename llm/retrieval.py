@@ -0,0 +1,115 @@
+from typing import Dict, List
+import os
+import re
+
+# Tech stack fields that training_data documents are matched on
+STACK_FIELDS = ["frontend", "backend", "database", "authentication", "fileStorage", "payments", "ai"]
+
+# Fields of a training_data document that end up in the enhancement prompt
+DEFAULT_PROMPT_FIELDS = STACK_FIELDS + ["appType", "description", "files"]
+
+# Anchored, case-sensitive prefixes can be answered from the appType index
+STORAGE_APP_TYPES = [re.compile("^storage"), re.compile("^Storage")]
+
+
+def retrieval_top_k() -> int:
+    return int(os.getenv("RETRIEVAL_TOP_K", "5"))
+
+
+def retrieval_fields() -> List[str]:
+    fields = os.getenv("RETRIEVAL_FIELDS")
+    if not fields:
+        return DEFAULT_PROMPT_FIELDS
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+def build_ranked_pipeline(tech_stack: Dict[str, str], top_k: int, fields: List[str]) -> List[Dict]:
+    """Build an aggregation that ranks projects by the number of matching stack keys.
+
+    Each ``$or`` branch is a single-field equality served by its own index,
+    documents are projected down to prompt fields before scoring, and the
+    ``$sort`` + ``$limit`` pair is coalesced by the server into a top-k sort.
+    """
+    matches = {
+        key: value for key, value in tech_stack.items()
+        if value and key in STACK_FIELDS
+    }
+    if not matches:
+        return []
+
+    # Stack keys must survive the projection so they can be scored
+    projection = {field: 1 for field in fields + list(matches)}
+    return [
+        {"$match": {"$or": [{key: value} for key, value in matches.items()]}},
+        {"$project": projection},
+        {"$addFields": {
+            "relevance": {
+                "$add": [
+                    {"$cond": [{"$eq": [f"${key}", value]}, 1, 0]}
+                    for key, value in matches.items()
+                ]
+            }
+        }},
+        {"$sort": {"relevance": -1, "_id": 1}},
+        {"$limit": top_k}
+    ]
+
+
+def build_fallback_query(tech_stack: Dict[str, str]) -> Dict:
+    """Broader query used when no project shares any stack key"""
+    clauses = [{"appType": {"$in": STORAGE_APP_TYPES}}]
+    if tech_stack.get("backend"):
+        clauses.insert(0, {"backend": tech_stack["backend"]})
+    return {"$or": clauses}
+
+
+async def ensure_retrieval_indexes(collection) -> None:
+    """Create the indexes that back ranked and fallback retrieval"""
+    try:
+        for field in STACK_FIELDS + ["appType"]:
+            await collection.create_index(field)
+        await collection.create_index([
+            ("frontend", 1),
+            ("backend", 1),
+            ("database", 1)
+        ])
+    except Exception as e:
+        print(f"Error creating retrieval indexes: {e}")
+
+
+async def find_ranked_projects(collection, tech_stack: Dict[str, str]) -> List[Dict]:
+    """Return the top-k training projects for a tech stack, best match first"""
+    top_k = retrieval_top_k()
+    fields = retrieval_fields()
+
+    pipeline = build_ranked_pipeline(tech_stack, top_k, fields)
+    results = []
+    if pipeline:
+        results = await collection.aggregate(pipeline).to_list(length=top_k)
+
+    if not results:
+        results = await collection.find(
+            build_fallback_query(tech_stack),
+            {field: 1 for field in fields}
+        ).limit(top_k).to_list(length=top_k)
+
+    return results
+
+
+async def find_vector_projects(collection, index, query_vector: List[float]) -> List[Dict]:
+    """Return the top-k training projects nearest to an embedded query"""
+    top_k = retrieval_top_k()
+    neighbours = index.search(query_vector, top_k)
+    if not neighbours:
+        return []
+
+    scores = dict(neighbours)
+    documents = await collection.find(
+        {"_id": {"$in": list(scores)}},
+        {field: 1 for field in retrieval_fields()}
+    ).to_list(length=top_k)
+
+    for document in documents:
+        document["relevance"] = scores[document["_id"]]
+    documents.sort(key=lambda document: document["relevance"], reverse=True)
+    return documents
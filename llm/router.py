@@ -0,0 +1,80 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import json
+from structure import STRUCTURE_STACK_KEYS
+
+
+@dataclass
+class Route:
+    """A model a job is sent to when it fits every configured limit.
+
+    Unset limits always match, so a route without limits catches every job.
+    """
+    name: str
+    service: Any
+    max_layers: Optional[int] = None
+    max_base_files: Optional[int] = None
+    max_prompt_chars: Optional[int] = None
+
+    def matches(self, size: Dict[str, int]) -> bool:
+        limits = {
+            "layers": self.max_layers,
+            "base_files": self.max_base_files,
+            "prompt_chars": self.max_prompt_chars
+        }
+        return all(limit is None or size[key] <= limit for key, limit in limits.items())
+
+
+def parse_routes(spec: str) -> List[Dict]:
+    """Parse the ``MODEL_ROUTES`` JSON list of route definitions.
+
+    Each entry needs a ``name`` and ``model``; ``max_layers``,
+    ``max_base_files`` and ``max_prompt_chars`` bound the jobs it accepts
+    and the remaining keys override the default backend settings, e.g.
+    ``[{"name": "small", "model": "Qwen/Qwen2.5-Coder-7B-Instruct", "max_layers": 2}]``.
+    """
+    if not spec:
+        return []
+    routes = json.loads(spec)
+    for route in routes:
+        if not route.get("name") or not route.get("model"):
+            raise ValueError(f"Model route needs a name and a model: {route}")
+    return routes
+
+
+def estimate_job_size(tech_stack: Dict, base_files: int, prompt: str) -> Dict[str, int]:
+    """Size signals used for routing: selected layers, base files and prompt length.
+
+    Only stack keys that generate base files count as layers.
+    """
+    return {
+        "layers": sum(1 for key in STRUCTURE_STACK_KEYS if tech_stack.get(key)),
+        "base_files": base_files,
+        "prompt_chars": len(prompt)
+    }
+
+
+class ModelRouter:
+    """Send each job to the first route it fits, falling back to the default model"""
+
+    def __init__(self, routes: List[Route], default: Route):
+        self.routes = routes
+        self.default = default
+        self._decisions = Counter()
+
+    def route(self, tech_stack: Dict, base_files: int, prompt: str) -> Tuple[Any, Dict]:
+        """Return the inference service for a job and the recorded decision"""
+        size = estimate_job_size(tech_stack, base_files, prompt)
+        route = next((route for route in self.routes if route.matches(size)), self.default)
+        self._decisions[route.name] += 1
+        return route.service, {"route": route.name, "model": route.service.model, **size}
+
+    def services(self) -> List[Any]:
+        return [route.service for route in self.routes] + [self.default.service]
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {
+            route.name: {**route.service.metrics(), "routed": self._decisions[route.name]}
+            for route in self.routes + [self.default]
+        }
@@ -0,0 +1,147 @@
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+import asyncio
+import math
+import time
+
+
+class QueueFullError(Exception):
+    """Raised when a request is shed because the admission queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Generation queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def parse_priority_classes(spec: str) -> Dict[str, int]:
+    """Parse ``"enterprise:0,plus:1,free:2"`` into a plan -> priority map"""
+    classes = {}
+    for item in spec.split(","):
+        if ":" in item:
+            plan, priority = item.split(":", 1)
+            classes[plan.strip().lower()] = int(priority)
+    return classes
+
+
+class AdmissionController:
+    """Bounded admission queue in front of the inference backend.
+
+    At most ``max_active`` generations run at once. Further requests wait in
+    per-priority queues (lower number first); within a priority class users
+    are served round-robin so one client cannot starve the others. When
+    ``max_queue`` requests are already waiting, new ones are rejected with
+    an estimated retry delay.
+    """
+
+    def __init__(self, max_active: int, max_queue: int, priority_classes: Dict[str, int]):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.priority_classes = priority_classes
+        self.default_priority = max(priority_classes.values(), default=0)
+        self._active = 0
+        self._waiting = 0
+        self._queues: Dict[int, "OrderedDict[str, deque]"] = {}
+        self._stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "service_seconds_total": 0.0,
+            "completed": 0
+        }
+
+    def priority_for(self, plan: Optional[str]) -> int:
+        return self.priority_classes.get((plan or "").lower(), self.default_priority)
+
+    @asynccontextmanager
+    async def slot(self, user_id: str, plan: Optional[str]) -> AsyncIterator[float]:
+        """Hold a generation slot; yields the seconds spent queueing"""
+        queued_at = time.monotonic()
+        await self._acquire(user_id, self.priority_for(plan))
+        waited = time.monotonic() - queued_at
+        self._stats["admitted"] += 1
+        self._stats["wait_seconds_total"] += waited
+        self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+        started_at = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self._stats["service_seconds_total"] += time.monotonic() - started_at
+            self._stats["completed"] += 1
+            self._release()
+
+    async def _acquire(self, user_id: str, priority: int) -> None:
+        if self._active < self.max_active and not self._waiting:
+            self._active += 1
+            return
+        if self._waiting >= self.max_queue:
+            self._stats["rejected"] += 1
+            raise QueueFullError(self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        users = self._queues.setdefault(priority, OrderedDict())
+        users.setdefault(user_id, deque()).append(future)
+        self._waiting += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the waiter went away
+                self._release()
+            else:
+                self._discard(priority, user_id, future)
+            raise
+
+    def _discard(self, priority: int, user_id: str, future: asyncio.Future) -> None:
+        users = self._queues.get(priority, {})
+        waiters = users.get(user_id)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            self._waiting -= 1
+            if not waiters:
+                del users[user_id]
+
+    def _release(self) -> None:
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            while users:
+                # Serve the longest-waiting user, then rotate them to the back
+                user_id, waiters = next(iter(users.items()))
+                future = waiters.popleft()
+                self._waiting -= 1
+                if waiters:
+                    users.move_to_end(user_id)
+                else:
+                    del users[user_id]
+                # A waiter cancelled in this loop tick has not been discarded yet
+                if future.done():
+                    continue
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    def is_full(self) -> bool:
+        """True when a new request would be rejected right now"""
+        return self._waiting >= self.max_queue and self._active >= self.max_active
+
+    def retry_after(self) -> int:
+        """Estimate how long until the current queue drains"""
+        completed = self._stats["completed"]
+        average = self._stats["service_seconds_total"] / completed if completed else 30.0
+        return max(1, math.ceil(average * (self._waiting + 1) / self.max_active))
+
+    def metrics(self) -> Dict[str, float]:
+        admitted = self._stats["admitted"]
+        return {
+            "active": self._active,
+            "queue_depth": self._waiting,
+            "max_active": self.max_active,
+            "max_queue": self.max_queue,
+            "admitted": admitted,
+            "rejected": self._stats["rejected"],
+            "completed": self._stats["completed"],
+            "wait_seconds_avg": self._stats["wait_seconds_total"] / admitted if admitted else 0.0,
+            "wait_seconds_max": self._stats["wait_seconds_max"]
+        }
@@ -0,0 +1,168 @@
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import posixpath
+import re
+import uuid
+from merge import normalise_path
+
+# Session ids are issued by the server and double as the capability to
+# access the session, so they must stay unguessable
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Files the model adds on its own are attributed to this layer when no
+# base file shares their directory
+PROMPT_LAYER = "prompt"
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def valid_session_id(session_id: str) -> bool:
+    return bool(SESSION_ID_PATTERN.match(session_id or ""))
+
+
+def attribute_layers(files: List[Dict], layer_map: Dict[str, str]) -> Dict[str, str]:
+    """Map every artifact to a layer.
+
+    Base files keep the layer whose generator produced them. Other files
+    take the layer of the base file sharing the deepest directory, so for
+    example a new checkout route sits in the payments layer next to the
+    existing one.
+    """
+    base = {normalise_path(name): layer for name, layer in layer_map.items()}
+    layers = {}
+    for file in files:
+        name = normalise_path(file["filename"])
+        if name in base:
+            layers[file["filename"]] = base[name]
+            continue
+        directory, best, best_depth = posixpath.dirname(name), PROMPT_LAYER, 0
+        for base_name, layer in base.items():
+            common = posixpath.commonpath([directory, posixpath.dirname(base_name)]) if directory else ""
+            depth = len(common.split("/")) if common else 0
+            if depth > best_depth:
+                best, best_depth = layer, depth
+        layers[file["filename"]] = best
+    return layers
+
+
+def plan_followup(
+    session: Dict,
+    old_base: List[Dict],
+    new_base: List[Dict],
+    new_layer_map: Dict[str, str]
+) -> Dict:
+    """Work out which artifacts a follow-up turn can reuse.
+
+    Base files whose template changed between the session's stack and the
+    new one mark their layer as affected. Artifacts of removed base files
+    and files the model added to an affected layer are dropped, changed
+    or added base files restart from their new template, and everything
+    else is carried over unchanged.
+    """
+    old = {file["filename"]: file["content"] for file in old_base}
+    new = {file["filename"]: file for file in new_base}
+    changed = [name for name, file in new.items() if old.get(name) != file["content"]]
+    removed = set(old) - set(new)
+    old_layers = session.get("layers", {})
+    affected = {new_layer_map[name] for name in changed if name in new_layer_map}
+    affected |= {old_layers[name] for name in removed if name in old_layers}
+
+    artifacts, reset, dropped = [], [], []
+    for file in session.get("artifacts", []):
+        name = file["filename"]
+        if name in removed or (name not in new and old_layers.get(name) in affected):
+            dropped.append(name)
+        elif name in changed:
+            artifacts.append(new[name])
+            reset.append(name)
+        else:
+            artifacts.append(file)
+
+    present = {file["filename"] for file in artifacts}
+    for name in changed:
+        if name not in present:
+            artifacts.append(new[name])
+            reset.append(name)
+
+    layers = {**old_layers, **attribute_layers(artifacts, new_layer_map)}
+    return {
+        "artifacts": artifacts,
+        "affected_layers": sorted(affected),
+        "affected_files": [file["filename"] for file in artifacts if layers.get(file["filename"]) in affected],
+        "reset": reset,
+        "dropped": dropped
+    }
+
+
+class SessionLocks:
+    """Serialise turns of the same session within this process"""
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._holders: Dict[str, int] = defaultdict(int)
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        self._holders[session_id] += 1
+        try:
+            async with self._locks[session_id]:
+                yield
+        finally:
+            self._holders[session_id] -= 1
+            if not self._holders[session_id]:
+                del self._holders[session_id]
+                del self._locks[session_id]
+
+
+async def ensure_session_indexes(collection, ttl_seconds: int) -> None:
+    """Expire sessions that have not been touched for ``ttl_seconds``"""
+    try:
+        await collection.create_index("updated_at", expireAfterSeconds=ttl_seconds)
+    except Exception as e:
+        print(f"Error creating session indexes: {e}")
+
+
+async def load_session(collection, session_id: str) -> Optional[Dict]:
+    session = await collection.find_one({"_id": session_id})
+    if session is not None:
+        # Filenames contain dots, so the layer map is stored as a list
+        session["layers"] = {entry["filename"]: entry["layer"] for entry in session.get("layers", [])}
+    return session
+
+
+async def save_session(
+    collection,
+    session_id: str,
+    tech_stack: Dict,
+    artifacts: List[Dict],
+    layers: Dict[str, str],
+    setup_instructions: str,
+    turn: Dict
+) -> None:
+    """Store the latest artifacts of a session and append the turn to its history"""
+    now = datetime.now(timezone.utc)
+    await collection.update_one(
+        {"_id": session_id},
+        {
+            "$set": {
+                "tech_stack": tech_stack,
+                "artifacts": artifacts,
+                "layers": [{"filename": name, "layer": layer} for name, layer in layers.items()],
+                "setup_instructions": setup_instructions,
+                "updated_at": now
+            },
+            "$setOnInsert": {"created_at": now},
+            "$push": {"turns": {**turn, "at": now}}
+        },
+        upsert=True
+    )
+
+
+async def delete_session(collection, session_id: str) -> bool:
+    result = await collection.delete_one({"_id": session_id})
+    return result.deleted_count > 0
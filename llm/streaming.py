@@ -0,0 +1,175 @@
+from typing import Dict, List, Optional, Tuple
+import json
+import re
+
+FILENAME_PATTERN = re.compile(r'"filename"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+# Start of a generation document, and any prefix of one cut off by the end of a chunk
+DOCUMENT_START = re.compile(r'\{\s*"files"\s*:')
+PARTIAL_DOCUMENT_START = re.compile(r'\{\s*(?:"(?:f(?:i(?:l(?:e(?:s(?:"\s*)?)?)?)?)?)?)?\Z')
+
+
+class IncrementalFilesParser:
+    """Incrementally scan a model response for entries of its "files" array.
+
+    Text is fed chunk by chunk as tokens arrive; every file object inside the
+    top-level ``{"files": [...]}`` structure is returned as soon as its closing
+    brace has been seen, without waiting for the rest of the document. Text
+    before or after the JSON object (code fences, commentary) is ignored, and
+    a response cut off mid-document still yields every file that was closed.
+    A stray brace in a preamble does not hide the document: until the files
+    array is found, a ``{"files":`` start restarts the scan at depth zero.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.files: List[Dict] = []
+        self.last_file_end = None
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._files_depth = None
+        self._object_start = None
+        self._document_starts: List[int] = []
+        self._complete = False
+
+    @property
+    def truncated(self) -> bool:
+        """True when the input ended inside an unclosed JSON object"""
+        return self._depth > 0 and not self._complete
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume a chunk of model output and return newly completed files"""
+        self.buffer += chunk
+        completed = []
+        text = self.buffer
+
+        while self._pos < len(text):
+            char = text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._object_start is None:
+                        self._last_key = text[self._string_start + 1:self._pos]
+            elif char == '"':
+                if self._depth > 0:
+                    self._in_string = True
+                    self._string_start = self._pos
+            elif char == "{" and self._depth > 0 and self._files_depth is None and not self.files and not completed:
+                if not DOCUMENT_START.match(text, self._pos):
+                    if PARTIAL_DOCUMENT_START.match(text, self._pos):
+                        # Wait for the next chunk to tell whether a document starts here
+                        break
+                    self._depth += 1
+                else:
+                    # An unbalanced brace before the document; start over here
+                    self._depth = 1
+                    self._last_key = None
+                    self._object_start = None
+                    self._document_starts.append(self._pos)
+            elif char in "{[":
+                if self._depth == 0:
+                    if char == "[":
+                        self._pos += 1
+                        continue
+                    self._document_starts.append(self._pos)
+                    self._last_key = None
+                self._depth += 1
+                if (
+                    char == "[" and self._depth == 2
+                    and self._files_depth is None
+                    and self._last_key == "files"
+                ):
+                    self._files_depth = self._depth
+                elif (
+                    char == "{" and self._files_depth is not None
+                    and self._depth == self._files_depth + 1
+                ):
+                    self._object_start = self._pos
+            elif char in "}]":
+                if self._depth > 0:
+                    self._depth -= 1
+                if (
+                    char == "}" and self._object_start is not None
+                    and self._depth == self._files_depth
+                ):
+                    file = self._load_file(text[self._object_start:self._pos + 1])
+                    if file is not None:
+                        completed.append(file)
+                        self.last_file_end = self._pos + 1
+                    self._object_start = None
+                elif char == "]" and self._files_depth is not None and self._depth == self._files_depth - 1:
+                    self._files_depth = None
+
+            self._pos += 1
+
+        self.files.extend(completed)
+        return completed
+
+    def _load_file(self, raw: str) -> Optional[Dict]:
+        try:
+            file = json.loads(raw)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing streamed file entry: {e}")
+            return None
+        if not isinstance(file, dict) or "filename" not in file:
+            return None
+        return file
+
+    def pending_file(self) -> Optional[str]:
+        """Filename of the file entry left open when the input stopped"""
+        if self._object_start is None:
+            return None
+        match = FILENAME_PATTERN.search(self.buffer, self._object_start)
+        if not match:
+            return "<unnamed file>"
+        try:
+            return json.loads(f'"{match.group(1)}"')
+        except json.JSONDecodeError:
+            return match.group(1)
+
+    def result(self) -> Tuple[Dict, List[str]]:
+        """Return the parsed response and the filenames that could not be recovered.
+
+        A complete JSON object is decoded as-is. Otherwise the response is
+        rebuilt from the file entries that were fully closed, and the file
+        that was cut off is reported as lost.
+        """
+        decoder = json.JSONDecoder()
+        starts = set(self._document_starts) | {match.start() for match in DOCUMENT_START.finditer(self.buffer)}
+        for start in sorted(starts):
+            try:
+                document, _ = decoder.raw_decode(self.buffer, start)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(document, dict) and "files" in document:
+                self._complete = True
+                return document, []
+
+        lost = []
+        pending = self.pending_file()
+        if pending is not None:
+            lost.append(pending)
+        if self.files or lost:
+            print(f"Recovered {len(self.files)} files from incomplete AI response, lost: {lost}")
+        return {"files": list(self.files)}, lost
+
+
+def parse_generation(content: str) -> IncrementalFilesParser:
+    """Run a complete response through the incremental parser"""
+    parser = IncrementalFilesParser()
+    parser.feed(content)
+    return parser
+
+
+def ndjson_event(event: str, **payload) -> str:
+    """Encode a single newline-delimited JSON event for the streaming endpoint"""
+    return json.dumps({"event": event, **payload}) + "\n"
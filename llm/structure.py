@@ -1,6 +1,8 @@
-from typing import Dict, List, Any
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, List, Any, Callable, Tuple
 import json
-from models import FileStructure, CustomJSONEncoder
+from models import FileRecord, CustomJSONEncoder
 from layers.ai import AILayerGenerator
 from layers.auth import AuthLayerGenerator
 from layers.backend import BackendTemplatesManager
@@ -9,6 +11,49 @@ from layers.frontends import FrontendTemplatesManager
 from layers.payment import PaymentsLayerGenerator
 from layers.storage import StorageLayerGenerator
 
+# Tech stack keys that determine the generated base structure
+STRUCTURE_STACK_KEYS = ("frontend", "backend", "database", "authentication", "fileStorage", "payments", "ai")
+
+# Upper bound on memoised stack manifests; stack values come from user input
+MANIFEST_CACHE_SIZE = 1024
+
+LANGUAGE_MAP = {
+    "ts": "typescript",
+    "tsx": "typescript",
+    "js": "javascript",
+    "jsx": "javascript",
+    "py": "python",
+    "rs": "rust",
+    "json": "json",
+    "css": "css",
+    "html": "html",
+    "vue": "vue",
+    "toml": "toml"
+}
+
+# Template files that are complete as generated and never need the model
+STATIC_FILENAMES = frozenset({
+    "tsconfig.json",
+    "postcss.config.js",
+    "tailwind.config.js",
+    "next.config.js",
+    "vite.config.ts",
+    "angular.json",
+    "Cargo.toml"
+})
+
+def is_static_file(file: Dict[str, str]) -> bool:
+    """True for template files that are returned verbatim instead of enhanced"""
+    basename = file["filename"].rsplit("/", 1)[-1]
+    return basename in STATIC_FILENAMES or not file["content"].strip()
+
+def split_static_files(files: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """Split base files into (enhanceable, static)"""
+    enhanceable, static = [], []
+    for file in files:
+        (static if is_static_file(file) else enhanceable).append(file)
+    return enhanceable, static
+
 class ProjectStructureManager(
     FrontendTemplatesManager,
     BackendTemplatesManager,
@@ -19,52 +64,100 @@ class ProjectStructureManager(
     AILayerGenerator
 ):
     def __init__(self):
+        # Framework templates are built lazily on first use and then shared,
+        # so a single manager instance should serve the whole process
         self.frontend_templates = self._initialize_frontend_templates()
         self.backend_templates = self._initialize_backend_templates()
+        self._layer_manifests: Dict[Tuple[str, ...], Tuple[Dict[str, str], ...]] = {}
+        # Per stack: the base file records and the layer that generated each one
+        self._stack_manifests: "OrderedDict[Tuple[str, ...], Tuple[Tuple[FileRecord, ...], Tuple[str, ...]]]" = OrderedDict()
 
     def generate_project_structure(self, tech_stack: Dict[str, str]) -> List[Dict[str, str]]:
+        """Return the base files for a tech stack as plain dicts"""
+        return [record.to_dict() for record in self.generate_project_records(tech_stack)]
+
+    def generate_project_records(self, tech_stack: Dict[str, str]) -> Tuple[FileRecord, ...]:
+        """Return the immutable base file records for a tech stack.
+
+        The output is deterministic per stack, so the manifest is validated
+        and built once; later calls return the memoised records directly.
+        """
+        return self._stack_manifest(tech_stack)[0]
+
+    def generate_layer_map(self, tech_stack: Dict[str, str]) -> Dict[str, str]:
+        """Map each base filename to the stack layer whose generator produced it"""
+        records, layers = self._stack_manifest(tech_stack)
+        return {record.filename: layer for record, layer in zip(records, layers)}
+
+    def _stack_manifest(self, tech_stack: Dict[str, str]) -> Tuple[Tuple[FileRecord, ...], Tuple[str, ...]]:
+        key = tuple((tech_stack.get(name) or "").lower() for name in STRUCTURE_STACK_KEYS)
+        manifest = self._stack_manifests.get(key)
+        if manifest is None:
+            manifest = self._build_stack_manifest(tech_stack)
+            self._stack_manifests[key] = manifest
+            if len(self._stack_manifests) > MANIFEST_CACHE_SIZE:
+                self._stack_manifests.popitem(last=False)
+        else:
+            self._stack_manifests.move_to_end(key)
+        return manifest
+
+    def _layer_manifest(self, key: Tuple[str, ...], build: Callable[[], List[Dict[str, str]]]) -> Tuple[Dict[str, str], ...]:
+        """Flatten a template layer once and reuse it for every stack that includes it"""
+        manifest = self._layer_manifests.get(key)
+        if manifest is None:
+            manifest = tuple(build())
+            self._layer_manifests[key] = manifest
+        return manifest
+
+    def _build_stack_manifest(self, tech_stack: Dict[str, str]) -> Tuple[Tuple[FileRecord, ...], Tuple[str, ...]]:
         try:
-            files = []
-            
-            # Generate frontend layer
-            frontend = tech_stack.get("frontend", "").lower()
-            if frontend in self.frontend_templates:
-                files.extend(self._generate_frontend_files(frontend))
-            
-            # Generate backend layer
-            backend = tech_stack.get("backend", "").lower()
-            if backend in self.backend_templates:
-                files.extend(self._generate_backend_files(backend, frontend))
-            
-            # Generate additional layers
-            layer_generators = {
-                "database": self._generate_database_layer,
-                "authentication": self._generate_auth_layer,
-                "fileStorage": self._generate_storage_layer,
-                "payments": self._generate_payment_layer,
-                "ai": self._generate_ai_layer
-            }
-
-            for key, generator in layer_generators.items():
-                if tech_stack.get(key):
-                    files.extend(generator(tech_stack))
-
-            # Validate and process files
-            validated_files = [
-                FileStructure(
-                    filename=file["filename"],
-                    content=file["content"],
-                    language=file["language"]
-                ).model_dump()
+            # Validate once at registration; requests share the frozen records
+            entries = [
+                (FileRecord.from_file(file), layer)
+                for layer, files in self._build_stack_layers(tech_stack)
                 for file in files
             ]
-
-            return json.loads(json.dumps(validated_files, cls=CustomJSONEncoder))
+            return tuple(record for record, _ in entries), tuple(layer for _, layer in entries)
             
         except Exception as e:
             print(f"Error generating project structure: {str(e)}")
             raise
 
+    def _build_stack_layers(self, tech_stack: Dict[str, str]) -> List[Tuple[str, List[Dict[str, str]]]]:
+        """Base files for a tech stack, grouped by the layer that generates them"""
+        layers = []
+        
+        # Generate frontend layer
+        frontend = tech_stack.get("frontend", "").lower()
+        if frontend in self.frontend_templates:
+            layers.append(("frontend", self._layer_manifest(
+                ("frontend", frontend),
+                lambda: self._generate_frontend_files(frontend)
+            )))
+        
+        # Generate backend layer
+        backend = tech_stack.get("backend", "").lower()
+        if backend in self.backend_templates:
+            layers.append(("backend", self._layer_manifest(
+                ("backend", backend, frontend == "nextjs"),
+                lambda: self._generate_backend_files(backend, frontend)
+            )))
+        
+        # Generate additional layers
+        layer_generators = {
+            "database": self._generate_database_layer,
+            "authentication": self._generate_auth_layer,
+            "fileStorage": self._generate_storage_layer,
+            "payments": self._generate_payment_layer,
+            "ai": self._generate_ai_layer
+        }
+
+        for key, generator in layer_generators.items():
+            if tech_stack.get(key):
+                layers.append((key, generator(tech_stack)))
+
+        return layers
+
     def _process_file_content(self, content: Any) -> str:
         """Process file content with proper error handling and type checking"""
         try:
@@ -77,14 +170,15 @@ class ProjectStructureManager(
             print(f"Error processing file content: {str(e)}")
             return ""
 
-    def _flatten_structure(self, structure: dict, prefix: str = "") -> List[tuple]:
+    def _flatten_structure(self, structure: Mapping, prefix: str = "", files: List[tuple] = None) -> List[tuple]:
         """Flatten nested directory structure"""
         try:
-            files = []
+            if files is None:
+                files = []
             for key, value in structure.items():
                 path = f"{prefix}/{key}" if prefix else key
-                if isinstance(value, dict):
-                    files.extend(self._flatten_structure(value, path))
+                if isinstance(value, Mapping):
+                    self._flatten_structure(value, path, files)
                 else:
                     files.append((path, value))
             return files
@@ -95,20 +189,7 @@ class ProjectStructureManager(
     def _detect_language(self, filepath: str) -> str:
         """Detect file language based on extension"""
         try:
-            ext = filepath.split(".")[-1].lower()
-            language_map = {
-                "ts": "typescript",
-                "tsx": "typescript",
-                "js": "javascript",
-                "jsx": "javascript",
-                "py": "python",
-                "rs": "rust",
-                "json": "json",
-                "css": "css",
-                "html": "html",
-                "vue": "vue",
-                "toml": "toml"
-            }
-            return language_map.get(ext, "plaintext")
+            ext = filepath.rsplit(".", 1)[-1].lower()
+            return LANGUAGE_MAP.get(ext, "plaintext")
         except Exception:
             return "plaintext"
\ No newline at end of file
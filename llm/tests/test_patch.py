@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+from patch import apply_edit, apply_edits, generate_patches, parse_edit_blocks
+
+
+def edit_block(filename: str, search: str, replace: str) -> str:
+    return f"FILE: {filename}\n<<<<<<< SEARCH\n{search}=======\n{replace}>>>>>>> REPLACE\n"
+
+
+def file(filename: str, content: str) -> dict:
+    return {"filename": filename, "content": content, "language": "typescript"}
+
+
+def test_apply_edit_exact_match():
+    assert apply_edit("a\nb\nc\n", "b\n", "B\n") == "a\nB\nc\n"
+
+
+def test_apply_edit_ignores_trailing_whitespace():
+    assert apply_edit("a  \nb\n", "a\n", "A\n") == "A\nb\n"
+
+
+def test_apply_edit_empty_search_appends():
+    assert apply_edit("a", "", "b\n") == "a\nb\n"
+
+
+def test_apply_edit_missing_search():
+    assert apply_edit("a\n", "x\n", "y\n") is None
+
+
+def test_parse_edit_blocks_ignores_truncated_block():
+    text = edit_block("src/a.ts", "a\n", "b\n") + "FILE: src/b.ts\n<<<<<<< SEARCH\nx\n=======\ny"
+    edits, meta = parse_edit_blocks(text + '\nMETA: {"dependencies": {"zod": "3"}}')
+    assert [edit["filename"] for edit in edits] == ["src/a.ts"]
+    assert meta == {"dependencies": {"zod": "3"}}
+
+
+def test_apply_edits_changes_creates_and_fails():
+    base = [file("src/a.ts", "const a = 1;\n"), file("src/b.ts", "const b = 1;\n")]
+    edits, _ = parse_edit_blocks(
+        edit_block("src/a.ts", "const a = 1;\n", "const a = 2;\n")
+        + edit_block("src/b.ts", "missing\n", "x\n")
+        + edit_block("src/new.ts", "", "export {};\n")
+        + edit_block("src/unknown.ts", "x\n", "y\n")
+    )
+    files, failed, skipped = apply_edits(base, edits)
+    assert {f["filename"]: f["content"] for f in files} == {
+        "src/a.ts": "const a = 2;\n",
+        "src/new.ts": "export {};\n"
+    }
+    assert failed == ["src/b.ts"]
+    assert skipped == ["src/unknown.ts"]
+
+
+def test_apply_edits_skips_fixed_files():
+    fixed = [file("tsconfig.json", '{"compilerOptions": {}}\n')]
+    edits, _ = parse_edit_blocks(edit_block("tsconfig.json", "", "// extra\n"))
+    files, failed, skipped = apply_edits([file("src/a.ts", "a\n")], edits, fixed)
+    assert files == []
+    assert failed == []
+    assert skipped == ["tsconfig.json"]
+
+
+class ScriptedInference:
+    def __init__(self, content: str):
+        self.content = content
+        self.calls = 0
+
+    async def chat_completion(self, messages, temperature, max_tokens):
+        self.calls += 1
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+
+
+def test_generate_patches_reports_failed_created_file_as_lost():
+    inference = ScriptedInference(
+        edit_block("src/new.ts", "", "export const x = 1;\n")
+        + edit_block("src/new.ts", "missing\n", "y\n")
+    )
+    result, stats = asyncio.run(generate_patches(
+        inference, [], [file("src/a.ts", "a\n")], {}, "prompt", 0.0, 512,
+        regenerate_max_tokens=256, concurrency=2
+    ))
+    assert result["files"] == []
+    assert stats["failed"] == ["src/new.ts"]
+    assert stats["lost"] == ["src/new.ts"]
+    assert stats["regenerated"] == []
+    assert inference.calls == 1
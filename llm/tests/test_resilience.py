@@ -0,0 +1,186 @@
+import asyncio
+import time
+import aiohttp
+import pytest
+from backends import FakeBackend, InferenceBackend
+from inference import InferenceService
+from resilience import RetryPolicy, call_with_resilience, deadline_scope, is_retryable
+
+MESSAGES = [{"role": "user", "content": "Build a todo app"}]
+
+
+class StatusError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class ScriptedBackend(FakeBackend):
+    """Fake backend whose successive completions follow a script.
+
+    Each step is an exception to raise or a latency in seconds before a
+    normal fake completion; the last step repeats once the script runs out.
+    """
+
+    def __init__(self, script, max_concurrency: int = 4):
+        super().__init__("fake-model", "fake-embedding", max_concurrency)
+        self.script = list(script)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def chat_completion(self, messages, temperature, max_tokens):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if isinstance(step, BaseException):
+            raise step
+        try:
+            await asyncio.sleep(step)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return await super().chat_completion(messages, temperature, max_tokens)
+
+
+def service(backend: InferenceBackend, **policy) -> InferenceService:
+    settings = {"max_attempts": 3, "base_delay": 0.0, "max_delay": 0.0, "deadline": 5.0}
+    settings.update(policy)
+    return InferenceService(backend, timeout=5.0, retry_policy=RetryPolicy(**settings))
+
+
+def complete(inference: InferenceService):
+    return inference.chat_completion(MESSAGES, temperature=0.0, max_tokens=64)
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (asyncio.TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (StatusError(429), True),
+    (StatusError(503), True),
+    (StatusError(400), False),
+    (aiohttp.ClientPayloadError("reset"), True),
+    (ValueError("bad request"), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_transient_failures_are_retried():
+    backend = ScriptedBackend([StatusError(503), ConnectionResetError(), 0.0])
+    inference = service(backend)
+    response = asyncio.run(complete(inference))
+    assert response.choices[0].finish_reason == "stop"
+    assert backend.calls == 3
+    assert inference.stats["retries"] == 2
+    assert inference.stats["failures"] == 0
+
+
+def test_non_retryable_errors_fail_immediately():
+    backend = ScriptedBackend([StatusError(400), 0.0])
+    inference = service(backend)
+    with pytest.raises(StatusError):
+        asyncio.run(complete(inference))
+    assert backend.calls == 1
+    assert inference.stats["failures"] == 1
+
+
+def test_last_attempt_error_propagates():
+    backend = ScriptedBackend([StatusError(503)])
+    with pytest.raises(StatusError):
+        asyncio.run(complete(service(backend, max_attempts=2)))
+    assert backend.calls == 2
+
+
+def test_backoff_never_sleeps_past_the_deadline():
+    backend = ScriptedBackend([StatusError(503)])
+    inference = service(backend, max_attempts=5, base_delay=30.0, max_delay=30.0, deadline=0.2)
+    started = time.monotonic()
+    with pytest.raises((asyncio.TimeoutError, StatusError)):
+        asyncio.run(complete(inference))
+    assert time.monotonic() - started < 1.0
+
+
+def test_deadline_scope_is_shared_by_every_call():
+    backend = ScriptedBackend([0.15])
+    inference = service(backend, max_attempts=1)
+
+    async def two_calls():
+        with deadline_scope(0.2):
+            await complete(inference)
+            await complete(inference)
+
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(two_calls())
+    assert time.monotonic() - started < 0.5
+
+
+def test_deadline_scope_reaches_tasks_started_inside_it():
+    async def slow():
+        await asyncio.sleep(1.0)
+
+    async def scenario():
+        policy = RetryPolicy(max_attempts=1, deadline=5.0)
+        with deadline_scope(0.1):
+            task = asyncio.create_task(call_with_resilience(slow, policy))
+        with pytest.raises(asyncio.TimeoutError):
+            await task
+
+    asyncio.run(scenario())
+
+
+def test_hedged_request_wins_and_cancels_the_slow_attempt():
+    backend = ScriptedBackend([1.0, 0.0])
+    inference = service(backend, max_attempts=1, hedge=True, hedge_after=0.05)
+    started = time.monotonic()
+    response = asyncio.run(complete(inference))
+    assert response.choices
+    assert time.monotonic() - started < 0.5
+    assert backend.calls == 2
+    assert backend.cancelled == 1
+    assert inference.stats["hedged"] == 1
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    """Run fake_inference_server on a free local port in a background thread"""
+    import socket
+    import threading
+    import uvicorn
+    import fake_inference_server
+
+    monkeypatch.setattr(fake_inference_server, "LATENCY_SECONDS", 0.0)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(fake_inference_server.app, host="127.0.0.1", port=port, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield fake_inference_server, f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+def test_retries_against_the_fake_inference_server(fake_server, monkeypatch):
+    from backends import OpenAICompatibleBackend
+
+    module, base_url = fake_server
+    # Fail the first two requests with 503, then serve normally
+    failures = iter([True, True])
+    monkeypatch.setattr(module.random, "random", lambda: 0.0 if next(failures, False) else 1.0)
+    monkeypatch.setattr(module, "FAILURE_RATE", 0.5)
+
+    async def scenario():
+        backend = OpenAICompatibleBackend("fake-model", "", 4, base_url, None, 5.0)
+        inference = service(backend)
+        try:
+            response = await complete(inference)
+        finally:
+            await inference.close()
+        return inference, response
+
+    inference, response = asyncio.run(scenario())
+    assert '"files"' in response.choices[0].message.content
+    assert inference.stats["retries"] == 2
+    assert inference.stats["failures"] == 0
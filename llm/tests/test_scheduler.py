@@ -0,0 +1,75 @@
+import asyncio
+from scheduler import AdmissionController
+
+
+def controller(max_active: int = 1, max_queue: int = 4) -> AdmissionController:
+    return AdmissionController(max_active, max_queue, {"enterprise": 0, "free": 1})
+
+
+def test_release_skips_waiter_cancelled_in_same_tick():
+    async def scenario():
+        admission = controller()
+        holder_entered, release_holder = asyncio.Event(), asyncio.Event()
+
+        async def holder():
+            async with admission.slot("a", "free"):
+                holder_entered.set()
+                await release_holder.wait()
+
+        async def waiter():
+            async with admission.slot("b", "free"):
+                pass
+
+        holder_task = asyncio.create_task(holder())
+        await holder_entered.wait()
+        waiter_task = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        assert admission.metrics()["queue_depth"] == 1
+
+        # The holder wakes first and releases its slot while the cancelled
+        # waiter's handler is still pending
+        release_holder.set()
+        waiter_task.cancel()
+        await holder_task
+        await asyncio.gather(waiter_task, return_exceptions=True)
+
+        metrics = admission.metrics()
+        assert metrics["active"] == 0
+        assert metrics["queue_depth"] == 0
+
+        async with admission.slot("c", "free"):
+            assert admission.metrics()["active"] == 1
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+
+def test_release_hands_slot_to_next_live_waiter():
+    async def scenario():
+        admission = controller()
+        order = []
+        holder_entered, release_holder = asyncio.Event(), asyncio.Event()
+
+        async def holder():
+            async with admission.slot("a", "free"):
+                holder_entered.set()
+                await release_holder.wait()
+
+        async def waiter(user_id: str):
+            async with admission.slot(user_id, "free"):
+                order.append(user_id)
+
+        holder_task = asyncio.create_task(holder())
+        await holder_entered.wait()
+        cancelled = asyncio.create_task(waiter("b"))
+        live = asyncio.create_task(waiter("c"))
+        await asyncio.sleep(0)
+
+        release_holder.set()
+        cancelled.cancel()
+        await asyncio.gather(holder_task, cancelled, live, return_exceptions=True)
+
+        assert order == ["c"]
+        assert admission.metrics()["active"] == 0
+        assert admission.metrics()["queue_depth"] == 0
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
@@ -0,0 +1,57 @@
+import json
+from streaming import IncrementalFilesParser, parse_generation
+
+DOCUMENT = {
+    "files": [
+        {"filename": "src/a.ts", "content": "const a = { b: '}' };\n", "language": "typescript"},
+        {"filename": "src/b.ts", "content": "export {};\n", "language": "typescript"}
+    ],
+    "setup_instructions": "npm install",
+    "dependencies": {}
+}
+
+
+def feed_in_chunks(text: str, size: int) -> IncrementalFilesParser:
+    parser = IncrementalFilesParser()
+    for start in range(0, len(text), size):
+        parser.feed(text[start:start + size])
+    return parser
+
+
+def test_complete_document_in_chunks():
+    for size in (1, 7, 1000):
+        parser = feed_in_chunks(json.dumps(DOCUMENT), size)
+        assert [file["filename"] for file in parser.files] == ["src/a.ts", "src/b.ts"]
+        assert not parser.truncated
+        assert parser.result() == (DOCUMENT, [])
+
+
+def test_braces_inside_strings_do_not_end_files():
+    parser = parse_generation(json.dumps(DOCUMENT))
+    assert parser.files[0]["content"] == "const a = { b: '}' };\n"
+
+
+def test_preamble_and_code_fence_are_ignored():
+    parser = parse_generation(f"Here is the project:\n```json\n{json.dumps(DOCUMENT)}\n```\n")
+    assert len(parser.files) == 2
+    assert parser.result() == (DOCUMENT, [])
+
+
+def test_unbalanced_brace_in_preamble():
+    for size in (1, 3, 1000):
+        parser = feed_in_chunks(f"Note: use {{ carefully\n{json.dumps(DOCUMENT)}", size)
+        assert [file["filename"] for file in parser.files] == ["src/a.ts", "src/b.ts"]
+        assert not parser.truncated
+        assert parser.result() == (DOCUMENT, [])
+
+
+def test_truncated_document_keeps_closed_files():
+    text = json.dumps(DOCUMENT)
+    cut = text.index('"src/b.ts"') + 20
+    parser = parse_generation(text[:cut])
+    assert [file["filename"] for file in parser.files] == ["src/a.ts"]
+    assert parser.truncated
+    result, lost = parser.result()
+    assert result == {"files": DOCUMENT["files"][:1]}
+    assert lost == ["src/b.ts"]
+    assert parser.last_file_end == text.index('{"filename": "src/b.ts"') - 2
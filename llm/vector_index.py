@@ -0,0 +1,153 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    """In-process cosine-similarity index over training_data embeddings.
+
+    Small corpora are searched brute force over a normalised float32 matrix.
+    Once the corpus reaches ``ivf_threshold`` vectors an inverted-file layout
+    is trained (k-means centroids) and queries only scan the ``n_probe``
+    closest lists. New documents are appended incrementally in both modes,
+    into a buffer that grows geometrically so refreshes do not copy the
+    whole corpus.
+
+    ``add`` may train centroids and is meant to run in a worker thread while
+    the event loop keeps searching; it only publishes fully built state.
+    """
+
+    def __init__(self, ivf_threshold: int = 50000, n_probe: int = 8, kmeans_iterations: int = 10):
+        self.ivf_threshold = ivf_threshold
+        self.n_probe = n_probe
+        self.kmeans_iterations = kmeans_iterations
+        self.ids: List = []
+        self.matrix: Optional[np.ndarray] = None
+        self.last_id = None
+        self._buffer: Optional[np.ndarray] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self.matrix is None else self.matrix.shape[1]
+
+    def add(self, ids: List, vectors: List[List[float]]) -> None:
+        """Append documents to the index, keeping existing vectors in place"""
+        if not ids:
+            return
+        new_vectors = _normalise(vectors)
+        if self.matrix is not None and new_vectors.shape[1] != self.matrix.shape[1]:
+            raise ValueError(
+                f"Embedding dimension {new_vectors.shape[1]} does not match index dimension {self.matrix.shape[1]}"
+            )
+
+        offset = len(self.ids)
+        size = offset + len(new_vectors)
+        if self._buffer is None or self._buffer.shape[0] < size:
+            buffer = np.empty((max(size, 2 * offset), new_vectors.shape[1]), dtype=np.float32)
+            if self.matrix is not None:
+                buffer[:offset] = self.matrix
+            self._buffer = buffer
+        # Rows past the published view are invisible to concurrent searches
+        self._buffer[offset:size] = new_vectors
+        self.ids = self.ids + list(ids)
+        self.matrix = self._buffer[:size]
+        self.last_id = ids[-1]
+
+        if self._centroids is not None:
+            self._assign(new_vectors, offset)
+        elif len(self.ids) >= self.ivf_threshold:
+            self._train()
+
+    def search(self, query: List[float], k: int) -> List[Tuple[object, float]]:
+        """Return up to ``k`` ``(id, score)`` pairs, most similar first"""
+        if self.matrix is None or k <= 0:
+            return []
+        query_vector = _normalise(query)[0]
+        if query_vector.shape[0] != self.matrix.shape[1]:
+            raise ValueError(
+                f"Query dimension {query_vector.shape[0]} does not match index dimension {self.matrix.shape[1]}"
+            )
+
+        if self._centroids is None:
+            candidates = None
+            scores = self.matrix @ query_vector
+        else:
+            centroid_scores = self._centroids @ query_vector
+            probe = np.argsort(-centroid_scores)[:self.n_probe]
+            candidates = np.concatenate([self._lists[i] for i in probe])
+            scores = self.matrix[candidates] @ query_vector
+
+        k = min(k, scores.shape[0])
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        positions = top if candidates is None else candidates[top]
+        return [(self.ids[int(position)], float(score)) for position, score in zip(positions, scores[top])]
+
+    def _train(self) -> None:
+        """Train IVF centroids with spherical k-means and bucket every vector"""
+        n_lists = max(int(np.sqrt(len(self.ids))), 1)
+        rng = np.random.default_rng(0)
+        sample_size = min(len(self.ids), n_lists * 256)
+        sample = self.matrix[rng.choice(len(self.ids), size=sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)]
+
+        for _ in range(self.kmeans_iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(n_lists):
+                members = sample[assignments == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = _normalise(centroids)
+
+        lists = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+        self._assign(self.matrix, 0, centroids, lists)
+        # Publish the lists before the centroids that switch searches to IVF
+        self._lists = lists
+        self._centroids = centroids
+
+    def _assign(
+        self,
+        vectors: np.ndarray,
+        offset: int,
+        centroids: Optional[np.ndarray] = None,
+        lists: Optional[List[np.ndarray]] = None
+    ) -> None:
+        centroids = self._centroids if centroids is None else centroids
+        lists = self._lists if lists is None else lists
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for i in np.unique(assignments):
+            members = np.nonzero(assignments == i)[0].astype(np.int64) + offset
+            lists[i] = np.concatenate([lists[i], members])
+
+
+async def load_embeddings(index: VectorIndex, collection, batch_size: int = 1000) -> int:
+    """Add every document newer than the last indexed one; returns the count added"""
+    query = {"embedding": {"$exists": True}}
+    if index.last_id is not None:
+        query["_id"] = {"$gt": index.last_id}
+
+    ids, vectors = [], []
+    cursor = collection.find(query, {"embedding": 1}).sort("_id", 1).batch_size(batch_size)
+    async for document in cursor:
+        ids.append(document["_id"])
+        vectors.append(document["embedding"])
+
+    # One append per refresh, off the event loop since it may train the IVF centroids
+    await run_in_threadpool(index.add, ids, vectors)
+    return len(ids)